@@ -1,102 +1,599 @@
+import os
 import time
 import math
 import random
-from typing import List, Tuple, Optional
+from typing import Callable, List, Tuple, Optional
+
+import bitboard
+import geometry
+import solver
+from transposition import (EXACT, LOWER, UPPER, ZOBRIST_P1, ZOBRIST_P2, ZOBRIST_SIDE,
+                           TranspositionTable, zobrist_key)
 
 ROWS = 6
 COLS = 12
 WIN_COUNT = 4
 MAX_TIME = 9.96  # Time limit in seconds
+BACKEND = "bitboard"  # Search backend: "bitboard", "list" or "batch" (numpy)
+TT_MAX_ENTRIES = 1 << 18  # Transposition table size (bitboard backend)
+MAX_DEPTH = ROWS * COLS  # No practical cap: the time manager decides when to stop
+CLOCK_CHECK_NODES = 1024  # Nodes between two clock checks
+ASPIRATION_WINDOW = 20  # Initial half-width around the previous iteration's score
+WORKERS = 1  # Search processes, 1 = this process only
+PARALLEL_MODE = "root"  # With WORKERS > 1: "root" (parallel.py) or "lazy_smp" (lazy_smp.py)
+TT_EXACT_DEPTH = False  # Only cut on table entries of exactly the needed depth (reproducible scores)
+ENDGAME_EMPTY_CELLS = 24  # Try the exact solver at or below this many empty cells
+ENDGAME_TIME_SHARE = 0.5  # Part of MAX_TIME the solver may use before the heuristic search takes over
+# Late move reductions (bitboard search): after the first LMR_FULL_MOVES moves,
+# quiet moves at LMR_MIN_DEPTH plies or more from the horizon are searched
+# LMR_REDUCTION plies shallower first (0 = off)
+LMR_FULL_MOVES = 3
+LMR_MIN_DEPTH = 3
+LMR_REDUCTION = 1
+MAX_EXTENSIONS = 4  # Threat extensions (one ply each) allowed along one line, 0 = off
+# Winning lines of the board, for the list-board search and the win checks
+GEOMETRY = geometry.get_geometry(ROWS, COLS, WIN_COUNT)
+# Opening book built by opening_book.py, used when the file exists
+OPENING_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+
+# Kept between calls: positions from earlier moves stay useful
+transposition_table = TranspositionTable(TT_MAX_ENTRIES)
+
+# Set from another thread to abort the running bitboard search (pondering)
+stop_requested = False
+
+# Nodes visited so far (never reset); the clock is read every CLOCK_CHECK_NODES
+node_count = 0
+# Search counters, never reset either: SearchStats reads their differences
+leaf_count = 0  # Heuristic evaluations at the depth limit
+cutoff_count = 0  # Beta cutoffs
+first_move_cutoff_count = 0  # Beta cutoffs on the first move tried
+# Best root column proven in the current iteration, kept if it is aborted
+root_best_column = None
+
+# Move ordering state for the bitboard search, reset by each ai_decision call
+principal_variation = {}  # Position key -> column, from the previous iteration
+killer_moves = [[None, None] for _ in range(ROWS * COLS + 1)]  # Per ply
+history_table = [[0] * COLS for _ in range(2)]  # [player 1, player 2][column]
+
+# Static order: center columns first, edges last
+CENTER_ORDER = sorted(range(COLS), key=lambda col: abs(2 * col - (COLS - 1)))
+
+def set_geometry(rows: int, cols: int, win_count: int):
+    """Play on another board size or line length (e.g. 6x7, 8x8, connect-5).
+    The bitboard backend, solver and opening book are built for 6x12
+    connect-4, so other geometries are searched with the list backend.
+    Engines keep the board size they were made with (see Engine)."""
+    global killer_moves, history_table, default_engine
+    _use_geometry(geometry.get_geometry(rows, cols, win_count))
+    killer_moves = [[None, None] for _ in range(rows * cols + 1)]
+    history_table = [[0] * cols for _ in range(2)]
+    default_engine = Engine._from_globals()
+
+def _use_geometry(board_geometry: geometry.Geometry):
+    """Rebind the module-level board size and the tables derived from it."""
+    global ROWS, COLS, WIN_COUNT, GEOMETRY, MAX_DEPTH, CENTER_ORDER
+    global MATE_THRESHOLD, WINDOW_SCORES, CODE_STEP, SCORE_BY_CODE
+    rows, cols, win_count = board_geometry.rows, board_geometry.cols, board_geometry.win_count
+    ROWS, COLS, WIN_COUNT = rows, cols, win_count
+    GEOMETRY = board_geometry
+    MAX_DEPTH = rows * cols
+    CENTER_ORDER = sorted(range(cols), key=lambda col: abs(2 * col - (cols - 1)))
+    MATE_THRESHOLD = 1000 - rows * cols
+    WINDOW_SCORES, CODE_STEP, SCORE_BY_CODE = window_score_tables(win_count)
+
+def is_bitboard_geometry(board_geometry: Optional[geometry.Geometry] = None) -> bool:
+    """Whether `board_geometry` (default: the module's) is the bitboards' 6x12 connect-4."""
+    board_geometry = board_geometry or GEOMETRY
+    return ((board_geometry.rows, board_geometry.cols, board_geometry.win_count)
+            == (bitboard.ROWS, bitboard.COLS, bitboard.WIN_COUNT))
 
-def is_terminal(board: List[List[int]]) -> bool:
-    if check_winner(board) != 0:
+def is_terminal(board: List[List[int]], last_move: Optional[Tuple[int, int]] = None) -> bool:
+    if last_move is not None:
+        if check_winner_at(board, *last_move) != 0:
+            return True
+    elif check_winner(board) != 0:
         return True
     return is_board_full(board)
 
-def ai_decision(board: List[List[int]]) -> int:
-    start_time = time.time()
+def ai_decision(board: List[List[int]], player: int = 1, backend: Optional[str] = None,
+                workers: Optional[int] = None, stats: Optional["SearchStats"] = None,
+                on_iteration: Optional[Callable[[dict], None]] = None) -> int:
+    """Best column for `player` on `board`. `backend` and `workers` default
+    to the BACKEND and WORKERS settings at call time. `stats`, if given, is
+    filled in with the search statistics; `on_iteration` is called with each
+    completed iteration's record (see SearchStats.iteration_done).
+
+    Calls go through one module-level Engine, which works out the moves
+    played since the previous call from the board; game loops that can tell
+    an Engine their moves should keep one of their own."""
+    return default_engine.decide(board, player, backend, workers, stats, on_iteration)
+
+class Engine:
+    """Search state kept over a game: transposition table, history and
+    killer moves, principal variation, and the position with its hash and
+    incremental evaluation.
+
+    Create one per game (or per side) and tell it every move with `play`;
+    `decide` then searches from the tracked position. Instead of being
+    cleared, the table ages one generation per search, history scores are
+    halved, and killer moves shift down one ply per move played, so each
+    move starts from what the previous searches found.
+
+    `board_geometry` (default: the module's at creation) is the engine's own
+    board size; activating the engine switches the module to it, so engines
+    for different boards can take turns in one process.
+    """
+
+    def __init__(self, tt_entries: int = TT_MAX_ENTRIES,
+                 board_geometry: Optional[geometry.Geometry] = None):
+        self.geometry = board_geometry or GEOMETRY
+        rows, cols = self.geometry.rows, self.geometry.cols
+        self.transposition_table = TranspositionTable(tt_entries)
+        self.killer_moves = [[None, None] for _ in range(rows * cols + 1)]
+        self.history_table = [[0] * cols for _ in range(2)]
+        self.principal_variation = {}
+        self.evaluator = IncrementalEvaluator()
+        self.new_game()
+
+    @classmethod
+    def _from_globals(cls) -> "Engine":
+        """Engine over the module-level search state, for ai_decision."""
+        engine = cls.__new__(cls)
+        engine.geometry = GEOMETRY
+        engine.transposition_table = transposition_table
+        engine.killer_moves = killer_moves
+        engine.history_table = history_table
+        engine.principal_variation = principal_variation
+        engine.evaluator = IncrementalEvaluator()
+        engine.new_game()
+        return engine
+
+    def new_game(self):
+        """Empty board, player 1 to move. The tables are kept: positions
+        from earlier games hash the same."""
+        self.board = [[0] * self.geometry.cols for _ in range(self.geometry.rows)]
+        self.player = 1
+        # Masks and Zobrist hash (without the side to move) of the board
+        self.p1, self.p2 = 0, 0
+        self.key = 0
+        self.evaluator.reset(0, 0)
+        for killers in self.killer_moves:
+            killers[0] = killers[1] = None
+
+    def activate(self):
+        """Point the module-level board size and search tables at this engine's,
+        so the search functions (and callers using them directly, like the
+        ponderer) use them."""
+        global transposition_table, killer_moves, history_table, principal_variation
+        if GEOMETRY is not self.geometry:
+            _use_geometry(self.geometry)
+        transposition_table = self.transposition_table
+        killer_moves = self.killer_moves
+        history_table = self.history_table
+        principal_variation = self.principal_variation
+
+    def play(self, column: int, player: Optional[int] = None):
+        """Record a move: `player` (default: the side to move) drops a disc in `column`."""
+        if player is None:
+            player = self.player
+        row = get_next_open_row(self.board, column)
+        if row is None:
+            raise ValueError(f"column {column} is full")
+        self._add_disc(row, column, player)
+        self._shift_killers(1)
+        self.player = -player
+
+    def set_board(self, board: List[List[int]], player: int):
+        """Catch up with `board`. When it only adds discs to the tracked board
+        they are played in; otherwise the position is set up from scratch."""
+        added = [(row, col) for row in range(self.geometry.rows) for col in range(self.geometry.cols)
+                 if board[row][col] != self.board[row][col]]
+        if any(self.board[row][col] != 0 for row, col in added):
+            self.board = [row[:] for row in board]
+            if is_bitboard_geometry(self.geometry):
+                self.p1, self.p2 = bitboard.from_list(board)
+                self.key = zobrist_key(self.p1, self.p2, 1)
+                self.evaluator.reset(self.p1, self.p2)
+            for killers in self.killer_moves:
+                killers[0] = killers[1] = None
+        else:
+            for row, col in added:
+                self._add_disc(row, col, board[row][col])
+            self._shift_killers(len(added))
+        self.player = player
+
+    def _add_disc(self, row: int, col: int, player: int):
+        self.board[row][col] = player
+        if is_bitboard_geometry(self.geometry):
+            index = bitboard.bit_index(row, col)
+            if player == 1:
+                self.p1 |= 1 << index
+                self.key ^= ZOBRIST_P1[index]
+            else:
+                self.p2 |= 1 << index
+                self.key ^= ZOBRIST_P2[index]
+            self.evaluator.play(index, player)
+
+    def _shift_killers(self, plies: int):
+        # Killers are per ply from the root, which moves down with each move
+        plies = min(plies, len(self.killer_moves))
+        del self.killer_moves[:plies]
+        self.killer_moves.extend([None, None] for _ in range(plies))
+
+    def _age_move_ordering(self):
+        for history in self.history_table:
+            history[:] = [score // 2 for score in history]
+
+    def _bitboard_search(self, position: Tuple[int, int], player: int, max_depth: int,
+                         alpha: float, beta: float, start_time: float) -> Tuple[float, Optional[int]]:
+        """bitboard_search from the tracked hash and evaluation."""
+        if stop_requested or time.time() - start_time >= MAX_TIME:
+            raise TimeoutError()
+
+        p1, p2 = position
+        key = self.key ^ ZOBRIST_SIDE if player == -1 else self.key
+        own, opp = (p1, p2) if player == 1 else (p2, p1)
+        evaluator.copy_from(self.evaluator)
+        score, best_column = bb_negamax(own, opp, key, alpha, beta, 0, max_depth, start_time, player)
+        update_principal_variation(p1, p2, key, max_depth, player)
+        return score, best_column
+
+    def decide(self, board: Optional[List[List[int]]] = None, player: Optional[int] = None,
+               backend: Optional[str] = None, workers: Optional[int] = None,
+               stats: Optional["SearchStats"] = None,
+               on_iteration: Optional[Callable[[dict], None]] = None) -> int:
+        """Best column for `player` (default: the side to move) on the tracked
+        board, or on `board` after catching up with it. The other arguments
+        are as for ai_decision."""
+        if player is None:
+            player = self.player
+        if backend is None:
+            backend = BACKEND
+        if workers is None:
+            workers = WORKERS
+        if board is not None:
+            self.set_board(board, player)
+        board = self.board
+        self.activate()
+
+        if stats is None and on_iteration is not None:
+            stats = SearchStats()
+        if stats is not None:
+            stats.start()
+
+        column = None
+        if is_bitboard_geometry():
+            column = book_move(board, player)
+        else:
+            # The book, bitboards and parallel searches are 6x12 connect-4 only
+            backend = "list"
+            workers = 1
+        if column is not None:
+            if stats is not None:
+                stats.finish("book")
+            return column
+
+        if workers > 1:
+            # Only the single-process search is instrumented
+            if stats is not None:
+                stats.finish("parallel")
+            if PARALLEL_MODE == "lazy_smp":
+                from lazy_smp import lazy_smp_decision
+                return lazy_smp_decision(board, player, workers)
+            from parallel import parallel_decision
+            return parallel_decision(board, player, workers)
+
+        start_time = time.time()
+        if backend == "bitboard":
+            search = self._bitboard_search
+            position = (self.p1, self.p2)
+        elif backend == "list":
+            search = alpha_beta_search
+            position = board
+        elif backend == "batch":
+            from batch_eval import batch_search
+            search = batch_search
+            position = board
+        else:
+            raise ValueError(f"Unknown backend: {backend}")
     
-    # Iterative deepening with Alpha-Beta pruning
-    best_column = 0
-    depth = 1
+        # Iterative deepening with Alpha-Beta pruning
+        global root_best_column
+        best_column = 0
+        depth = 1
+
+        # The search only looks for lines through each move it plays, so the
+        # board it starts from must be checked once in full
+        if is_terminal(board):
+            if stats is not None:
+                stats.finish("terminal")
+            return best_column
+        self.transposition_table.new_search()
+        self._age_move_ordering()
+        if backend != "bitboard":
+            # Only the bitboard search keeps the principal variation up to
+            # date: do not report (or order by) one from an earlier search
+            self.principal_variation.clear()
+        score = None
+        empty_cells = sum(row.count(0) for row in board)
+
+        # Few empty cells: try to solve the position outright. A proven loss
+        # still goes to the heuristic search, which plays the most stubborn line
+        if backend == "bitboard" and empty_cells <= ENDGAME_EMPTY_CELLS:
+            try:
+                result, column = solver.solve(*position, player, start_time + MAX_TIME * ENDGAME_TIME_SHARE)
+                if result != solver.LOSS:
+                    if stats is not None:
+                        stats.finish("solver")
+                    return column
+            except TimeoutError:
+                pass
+
+        clock = TimeManager(start_time)
+        stop_reason = "depth"
     
-    while depth <= 6:  # MAX_DEPTH
-        if time.time() - start_time > MAX_TIME * 0.4:
-            break
-                
-        try:
-            column = alpha_beta_search(board, depth, start_time)
+        while depth <= min(MAX_DEPTH, empty_cells):
+            if not clock.can_start_next():
+                stop_reason = "budget"
+                break
+            root_best_column = None
+            try:
+                score, column = aspiration_search(search, position, player, depth, score, start_time)
+            except TimeoutError:
+                # Keep the best move this iteration proved before running out
+                if root_best_column is not None:
+                    best_column = root_best_column
+                stop_reason = "timeout"
+                break
+
             if column is not None:
                 best_column = column
+            if stats is not None:
+                record = stats.iteration_done(depth, score, column)
+                if on_iteration is not None:
+                    on_iteration(record)
+            if score >= MATE_THRESHOLD:
+                stop_reason = "mate"
+                break  # Forced win found
+            clock.iteration_done()
             depth += 1
-        except TimeoutError:
-            break
-                
-    return best_column
 
-def alpha_beta_search(board: List[List[int]], max_depth: int, start_time: float) -> Optional[int]:
+        if stats is not None:
+            stats.finish(stop_reason)
+        return best_column
+
+# The book opened from OPENING_BOOK, and the path it was opened from
+_opening_book = None
+_opening_book_path = None
+
+def book_move(board: List[List[int]], player: int) -> Optional[int]:
+    """Column from the opening book, or None if the position is not in it.
+    The book is reopened when OPENING_BOOK changes, and dropped when it is
+    set to None or the file is gone."""
+    global _opening_book, _opening_book_path
+    if _opening_book is not None and _opening_book_path != OPENING_BOOK:
+        _opening_book.close()
+        _opening_book = _opening_book_path = None
+    if _opening_book is None:
+        if not OPENING_BOOK or not os.path.exists(OPENING_BOOK):
+            return None
+        from opening_book import OpeningBook
+        _opening_book = OpeningBook(OPENING_BOOK)
+        _opening_book_path = OPENING_BOOK
+    entry = _opening_book.lookup(board, player)
+    return entry[0] if entry is not None else None
+
+class SearchStats:
+    """Statistics of one ai_decision call, filled in when passed as `stats`.
+
+    The counters behind it are plain integer increments in the search (like
+    node_count), so a search without a SearchStats costs nothing more; the
+    per-iteration records are only built when one is given.
+    """
+
+    def __init__(self):
+        self.depth = 0  # Deepest completed iteration
+        self.score = None
+        self.pv: List[int] = []
+        self.nodes = 0
+        self.leaf_evals = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.time = 0.0
+        # Why the search stopped: "book", "parallel", "terminal", "solver",
+        # "depth" (board filled), "budget" (next iteration would not fit),
+        # "timeout" (aborted mid-iteration) or "mate"
+        self.stop_reason = None
+        self.iterations: List[dict] = []
+
+    def _counters(self) -> Tuple[int, int, int, int]:
+        return node_count, leaf_count, cutoff_count, first_move_cutoff_count
+
+    def start(self):
+        self.__init__()
+        self.start_time = self.iteration_start = time.time()
+        self.start_counters = self.iteration_counters = self._counters()
+
+    def iteration_done(self, depth: int, score: float, column: Optional[int]) -> dict:
+        """Record a completed iteration; returns its record."""
+        now = time.time()
+        counters = self._counters()
+        nodes, leaves, cutoffs, first_cutoffs = (new - old for new, old in zip(counters, self.iteration_counters))
+        previous = self.iterations[-1]["nodes"] if self.iterations else 0
+        self.depth = depth
+        self.score = score
+        self.pv = list(principal_variation.values()) or ([] if column is None else [column])
+        record = {
+            "depth": depth,
+            "score": score,
+            "column": column,
+            "pv": self.pv,
+            "nodes": nodes,
+            "leaf_evals": leaves,
+            "beta_cutoffs": cutoffs,
+            "first_move_cutoff_rate": first_cutoffs / cutoffs if cutoffs else None,
+            "branching_factor": nodes / previous if previous else None,
+            "time": now - self.iteration_start,
+            "elapsed": now - self.start_time,
+        }
+        self.iterations.append(record)
+        self.iteration_start = now
+        self.iteration_counters = counters
+        return record
+
+    def finish(self, stop_reason: str):
+        self.stop_reason = stop_reason
+        self.time = time.time() - self.start_time
+        self.nodes, self.leaf_evals, self.beta_cutoffs, self.first_move_cutoffs = (
+            new - old for new, old in zip(self._counters(), self.start_counters))
+
+    @property
+    def first_move_cutoff_rate(self) -> Optional[float]:
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else None
+
+    @property
+    def branching_factor(self) -> Optional[float]:
+        """Effective branching factor: node growth per depth over the completed iterations."""
+        counts = [record["nodes"] for record in self.iterations if record["nodes"] > 0]
+        if len(counts) < 2:
+            return None
+        return (counts[-1] / counts[0]) ** (1 / (len(counts) - 1))
+
+    def as_dict(self) -> dict:
+        return {
+            "depth": self.depth,
+            "score": self.score,
+            "pv": self.pv,
+            "nodes": self.nodes,
+            "leaf_evals": self.leaf_evals,
+            "beta_cutoffs": self.beta_cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoff_rate,
+            "branching_factor": self.branching_factor,
+            "time": self.time,
+            "stop_reason": self.stop_reason,
+            "iterations": self.iterations,
+        }
+
+class TimeManager:
+    """Starts a new iteration only if it is expected to finish in time.
+
+    The next iteration is predicted to cost the last one's time multiplied by
+    the measured effective branching factor: the growth of the node count
+    (or of the time, when nodes are not counted) per iteration, averaged over
+    the last two so that odd/even depth swings cancel out.
+    """
+
+    def __init__(self, start_time: float):
+        self.start_time = start_time
+        self.iteration_start = time.time()
+        self.iteration_nodes = node_count
+        self.times = []
+        self.nodes = []
+
+    def iteration_done(self, nodes: Optional[int] = None):
+        now = time.time()
+        self.times.append(now - self.iteration_start)
+        self.nodes.append(node_count - self.iteration_nodes if nodes is None else nodes)
+        self.iteration_start = now
+        self.iteration_nodes = node_count
+
+    def branching_factor(self) -> float:
+        if len(self.times) < 2:
+            return float(COLS)
+        span = 2 if len(self.times) >= 3 else 1
+        if self.nodes[-1 - span] > 0 and self.nodes[-1] > 0:
+            growth = self.nodes[-1] / self.nodes[-1 - span]
+        else:
+            growth = self.times[-1] / max(self.times[-1 - span], 1e-6)
+        return max(1.0, growth ** (1 / span))
+
+    def predicted_time(self) -> float:
+        if not self.times:
+            return 0.0
+        return self.times[-1] * self.branching_factor()
+
+    def can_start_next(self) -> bool:
+        return time.time() - self.start_time + self.predicted_time() < MAX_TIME
+
+def aspiration_search(search, position, player: int, max_depth: int,
+                      guess: Optional[float], start_time: float) -> Tuple[float, Optional[int]]:
+    """Search a window around the previous iteration's score, widening the
+    side that fails until the result lands inside it."""
+    if guess is None or abs(guess) >= MATE_THRESHOLD:
+        return search(position, player, max_depth, -math.inf, math.inf, start_time)
+
+    delta = ASPIRATION_WINDOW
+    alpha, beta = guess - delta, guess + delta
+    while True:
+        score, column = search(position, player, max_depth, alpha, beta, start_time)
+        if score <= alpha and alpha > -math.inf:
+            delta *= 4
+            alpha = guess - delta if delta < MATE_THRESHOLD else -math.inf
+        elif score >= beta and beta < math.inf:
+            delta *= 4
+            beta = guess + delta if delta < MATE_THRESHOLD else math.inf
+        else:
+            return score, column
+
+def alpha_beta_search(board: List[List[int]], player: int, max_depth: int,
+                      alpha: float, beta: float, start_time: float) -> Tuple[float, Optional[int]]:
     if time.time() - start_time >= MAX_TIME:
         raise TimeoutError()
     
-    _, best_column = max_value(board, -math.inf, math.inf, 0, max_depth, start_time)
-    return best_column
+    return negamax(board, alpha, beta, 0, max_depth, start_time, player)
 
-def max_value(board: List[List[int]], alpha: float, beta: float, 
-              depth: int, max_depth: int, start_time: float) -> Tuple[float, Optional[int]]:
+def negamax(board: List[List[int]], alpha: float, beta: float,
+            depth: int, max_depth: int, start_time: float, player: int,
+            last_move: Optional[Tuple[int, int]] = None) -> Tuple[float, Optional[int]]:
+    """Score of `board` for `player` (the side to move) and its best column."""
     
-    if time.time() - start_time >= MAX_TIME:
+    global node_count, leaf_count, cutoff_count, first_move_cutoff_count
+    node_count += 1
+    if node_count % CLOCK_CHECK_NODES == 0 and time.time() - start_time >= MAX_TIME:
         raise TimeoutError()
 
-    if is_terminal(board) or depth >= max_depth:
-        return evaluate_utility(board, depth), None
+    winner = check_winner_at(board, *last_move) if last_move is not None else 0
+    if winner != 0 or depth >= max_depth or is_board_full(board):
+        if winner == 0 and depth >= max_depth:
+            leaf_count += 1
+        return player * evaluate_utility(board, depth, winner), None
         
     value = -math.inf
     best_column = None
     
-    for column in get_valid_columns(board):
-        new_board = make_move(board, column, 1)  # PLAYER_1
-        min_val, _ = min_value(new_board, alpha, beta, depth + 1, max_depth, start_time)
+    for index, column in enumerate(get_valid_columns(board)):
+        row = get_next_open_row(board, column)
+        new_board = make_move(board, column, player)
+        if index == 0:
+            score = -negamax(new_board, -beta, -alpha, depth + 1, max_depth, start_time,
+                             -player, (row, column))[0]
+        else:
+            # Principal variation search: prove the move is no better than
+            # alpha with a null window, re-search only if that fails
+            score = -negamax(new_board, -alpha - 1, -alpha, depth + 1, max_depth, start_time,
+                             -player, (row, column))[0]
+            if alpha < score < beta:
+                score = -negamax(new_board, -beta, -alpha, depth + 1, max_depth, start_time,
+                                 -player, (row, column))[0]
         
-        if min_val > value:
-            value = min_val
+        if score > value:
+            value = score
             best_column = column
             
         if value >= beta:
+            cutoff_count += 1
+            if index == 0:
+                first_move_cutoff_count += 1
             return value, best_column
             
         alpha = max(alpha, value)
         
     return value, best_column
 
-def min_value(board: List[List[int]], alpha: float, beta: float,
-              depth: int, max_depth: int, start_time: float) -> Tuple[float, Optional[int]]:
-    
-    if time.time() - start_time >= MAX_TIME:
-        raise TimeoutError()
-
-    if is_terminal(board) or depth >= max_depth:
-        return evaluate_utility(board, depth), None
-        
-    value = math.inf
-    best_column = None
-    
-    for column in get_valid_columns(board):
-        new_board = make_move(board, column, -1)  # PLAYER_2
-        max_val, _ = max_value(new_board, alpha, beta, depth + 1, max_depth, start_time)
-        
-        if max_val < value:
-            value = max_val
-            best_column = column
-            
-        if value <= alpha:
-            return value, best_column
-            
-        beta = min(beta, value)
-        
-    return value, best_column
-
-def evaluate_utility(board: List[List[int]], depth: int) -> float:
-    winner = check_winner(board)
+def evaluate_utility(board: List[List[int]], depth: int, winner: Optional[int] = None) -> float:
+    if winner is None:
+        winner = check_winner(board)
     
     if winner == 1:  # PLAYER_1
         return 1000 - depth  # Prefer quick wins
@@ -108,32 +605,8 @@ def evaluate_utility(board: List[List[int]], depth: int) -> float:
         return evaluate_board(board)  # Heuristic evaluation
 
 def evaluate_board(board: List[List[int]]) -> float:
-    score = 0
-    
-    # Evaluate all 4-cell windows
-    # Horizontal
-    for row in range(ROWS):
-        for col in range(COLS - 3):
-            window = [board[row][col + i] for i in range(4)]
-            score += evaluate_window(window)
-    
-    # Vertical
-    for row in range(ROWS - 3):
-        for col in range(COLS):
-            window = [board[row + i][col] for i in range(4)]
-            score += evaluate_window(window)
-    
-    # Positive diagonal
-    for row in range(ROWS - 3):
-        for col in range(COLS - 3):
-            window = [board[row + i][col + i] for i in range(4)]
-            score += evaluate_window(window)
-    
-    # Negative diagonal
-    for row in range(3, ROWS):
-        for col in range(COLS - 3):
-            window = [board[row - i][col + i] for i in range(4)]
-            score += evaluate_window(window)
+    # Evaluate all WIN_COUNT-cell windows
+    score = GEOMETRY.line_score(board, SCORE_BY_CODE)
     
     # Bonus for center column
     center_column = COLS // 2
@@ -154,23 +627,23 @@ def evaluate_window(window: List[int]) -> float:
         return 0
     
     # Evaluation for our player
-    if player1_count == 4:
+    if player1_count == WIN_COUNT:
         score += 1000
-    elif player1_count == 3 and empty_count == 1:
+    elif player1_count == WIN_COUNT - 1 and empty_count == 1:
         score += 50
-    elif player1_count == 2 and empty_count == 2:
+    elif player1_count == WIN_COUNT - 2 and empty_count == 2:
         score += 10
-    elif player1_count == 1 and empty_count == 3:
+    elif player1_count == WIN_COUNT - 3 and empty_count == 3:
         score += 1
     
     # Defensive evaluation for opponent
-    if player2_count == 4:
+    if player2_count == WIN_COUNT:
         score -= 1000
-    elif player2_count == 3 and empty_count == 1:
+    elif player2_count == WIN_COUNT - 1 and empty_count == 1:
         score -= 80  # Important to block
-    elif player2_count == 2 and empty_count == 2:
+    elif player2_count == WIN_COUNT - 2 and empty_count == 2:
         score -= 15
-    elif player2_count == 1 and empty_count == 3:
+    elif player2_count == WIN_COUNT - 3 and empty_count == 3:
         score -= 2
     
     return score
@@ -182,6 +655,12 @@ def get_valid_columns(board: List[List[int]]) -> List[int]:
             valid_columns.append(col)
     return valid_columns
 
+def get_next_open_row(board: List[List[int]], col: int) -> Optional[int]:
+    for row in range(ROWS - 1, -1, -1):
+        if board[row][col] == 0:  # EMPTY
+            return row
+    return None
+
 def make_move(board: List[List[int]], col: int, player: int) -> List[List[int]]:
     new_board = [row[:] for row in board]
     
@@ -194,39 +673,305 @@ def make_move(board: List[List[int]], col: int, player: int) -> List[List[int]]:
     return new_board
 
 def check_winner(board: List[List[int]]) -> int:
-    # Check horizontal
-    for row in range(ROWS):
-        for col in range(COLS - 3):
-            if (board[row][col] != 0 and
-                board[row][col] == board[row][col+1] == 
-                board[row][col+2] == board[row][col+3]):
-                return board[row][col]
-    
-    # Check vertical
-    for row in range(ROWS - 3):
-        for col in range(COLS):
-            if (board[row][col] != 0 and
-                board[row][col] == board[row+1][col] == 
-                board[row+2][col] == board[row+3][col]):
-                return board[row][col]
-    
-    # Check positive diagonal
-    for row in range(ROWS - 3):
-        for col in range(COLS - 3):
-            if (board[row][col] != 0 and
-                board[row][col] == board[row+1][col+1] == 
-                board[row+2][col+2] == board[row+3][col+3]):
-                return board[row][col]
-    
-    # Check negative diagonal
-    for row in range(3, ROWS):
-        for col in range(COLS - 3):
-            if (board[row][col] != 0 and
-                board[row][col] == board[row-1][col+1] == 
-                board[row-2][col+2] == board[row-3][col+3]):
-                return board[row][col]
-    
-    return 0
+    return GEOMETRY.check_winner(board)
+
+def check_winner_at(board: List[List[int]], row: int, col: int) -> int:
+    """Winner through the disc at (row, col): only the lines crossing
+    that cell are tested, so this is enough after a single move."""
+    return GEOMETRY.winner_at(board, row, col)
 
 def is_board_full(board: List[List[int]]) -> bool:
     return all(board[0][col] != 0 for col in range(COLS))
+
+# Bitboard backend: same search as above on (player 1 mask, player 2 mask)
+# pairs, so moves, win tests and evaluation are a few integer operations.
+
+def bitboard_search(position: Tuple[int, int], player: int, max_depth: int,
+                    alpha: float, beta: float, start_time: float) -> Tuple[float, Optional[int]]:
+    if stop_requested or time.time() - start_time >= MAX_TIME:
+        raise TimeoutError()
+
+    p1, p2 = position
+    key = zobrist_key(p1, p2, player)
+    own, opp = (p1, p2) if player == 1 else (p2, p1)
+    evaluator.reset(p1, p2)
+    score, best_column = bb_negamax(own, opp, key, alpha, beta, 0, max_depth, start_time, player)
+    update_principal_variation(p1, p2, key, max_depth, player)
+    return score, best_column
+
+def bb_negamax(own: int, opp: int, key: int, alpha: float, beta: float,
+               depth: int, max_depth: int, start_time: float, player: int,
+               extensions: int = 0) -> Tuple[float, Optional[int]]:
+    """Negamax on (side to move mask, opponent mask); scores are for `player`.
+    `extensions` is the number of threat extensions on the line so far."""
+
+    global node_count, root_best_column, leaf_count, cutoff_count, first_move_cutoff_count
+    node_count += 1
+    if node_count % CLOCK_CHECK_NODES == 0 and (stop_requested or time.time() - start_time >= MAX_TIME):
+        raise TimeoutError()
+
+    # The opponent made the last move, so only they can have a new line
+    mask = own | opp
+    if bitboard.has_won(opp):
+        return -1000 + depth, None
+    if bitboard.is_full(mask):
+        return 0, None
+    if depth >= max_depth:
+        leaf_count += 1
+        return player * evaluator.score, None
+
+    # Threat scan: a winning move ends the search here, two opponent
+    # threats cannot both be blocked, and a single one must be
+    playable = bitboard.playable_cells(mask)
+    wins = bitboard.winning_cells(own, mask) & playable
+    if wins:
+        return 1000 - (depth + 1), bitboard.lowest_column(wins)
+    forced = bitboard.winning_cells(opp, mask) & playable
+    if forced & (forced - 1):
+        return -1000 + (depth + 2), bitboard.lowest_column(forced)
+
+    entry = transposition_table.probe(key)
+    tt_column = None
+    if entry is not None:
+        tt_depth, bound, tt_value, tt_column = entry
+        if depth > 0 and (tt_depth == max_depth - depth if TT_EXACT_DEPTH else tt_depth >= max_depth - depth):
+            tt_value = score_from_table(tt_value, depth)
+            if bound == EXACT:
+                return tt_value, tt_column
+            elif bound == LOWER:
+                alpha = max(alpha, tt_value)
+            else:
+                beta = min(beta, tt_value)
+            if alpha >= beta:
+                return tt_value, tt_column
+    window_alpha = alpha
+
+    zobrist = ZOBRIST_P1 if player == 1 else ZOBRIST_P2
+    side = 0 if player == 1 else 1
+    value = -math.inf
+    best_column = None
+
+    columns = [bitboard.lowest_column(forced)] if forced else order_moves(mask, key, depth, side, tt_column)
+    reducible = LMR_REDUCTION and depth > 0 and max_depth - depth >= LMR_MIN_DEPTH
+    for index, column in enumerate(columns):
+        bit = bitboard.move_bit(mask, column)
+        cell = bit.bit_length() - 1
+        child_key = key ^ zobrist[cell] ^ ZOBRIST_SIDE
+        late = reducible and index >= LMR_FULL_MOVES
+
+        # Forcing moves, which block the opponent's threat or make one of
+        # our own, are never reduced; a forced block is also extended a ply
+        threat = forced
+        if not threat and late:
+            threat = bitboard.winning_cells(own | bit, mask | bit) & bitboard.playable_cells(mask | bit)
+        child_depth, child_extensions = max_depth, extensions
+        if forced and extensions < MAX_EXTENSIONS:
+            child_depth += 1
+            child_extensions += 1
+
+        evaluator.play(cell, player)
+        if index == 0:
+            score = -bb_negamax(opp, own | bit, child_key, -beta, -alpha,
+                                depth + 1, child_depth, start_time, -player, child_extensions)[0]
+        else:
+            # Late move reduction: a late quiet move gets a shallower null-window
+            # search first and the full-depth one only if it beats alpha
+            if late and not threat:
+                score = -bb_negamax(opp, own | bit, child_key, -alpha - 1, -alpha,
+                                    depth + 1, child_depth - LMR_REDUCTION, start_time, -player,
+                                    child_extensions)[0]
+            if not late or threat or score > alpha:
+                # Principal variation search: prove the move is no better than
+                # alpha with a null window, re-search only if that fails
+                score = -bb_negamax(opp, own | bit, child_key, -alpha - 1, -alpha,
+                                    depth + 1, child_depth, start_time, -player, child_extensions)[0]
+                if alpha < score < beta:
+                    score = -bb_negamax(opp, own | bit, child_key, -beta, -alpha,
+                                        depth + 1, child_depth, start_time, -player, child_extensions)[0]
+        evaluator.undo(cell, player)
+
+        if score > value:
+            value = score
+            best_column = column
+            if depth == 0 and score > alpha:
+                root_best_column = column
+
+        if value >= beta:
+            cutoff_count += 1
+            if index == 0:
+                first_move_cutoff_count += 1
+            record_cutoff(column, depth, max_depth, side)
+            break
+
+        alpha = max(alpha, value)
+
+    bound = LOWER if value >= beta else UPPER if value <= window_alpha else EXACT
+    transposition_table.store(key, max_depth - depth, bound, score_to_table(value, depth), best_column)
+    return value, best_column
+
+def expected_reply(board: List[List[int]], player: int) -> Optional[int]:
+    """Column the transposition table expects `player` to play on `board`."""
+    p1, p2 = bitboard.from_list(board)
+    entry = transposition_table.probe(zobrist_key(p1, p2, player))
+    if entry is not None and entry[3] is not None and bitboard.can_play(p1 | p2, entry[3]):
+        return entry[3]
+    return None
+
+def reset_move_ordering():
+    principal_variation.clear()
+    for killers in killer_moves:
+        killers[0] = killers[1] = None
+    for history in history_table:
+        history[:] = [0] * COLS
+
+def order_moves(mask: int, key: int, depth: int, side: int, tt_column: Optional[int]) -> List[int]:
+    """Legal columns in search order: previous principal variation move,
+    table move, killer moves for this ply, then by history score with the
+    center-out order breaking ties."""
+    columns = [col for col in CENTER_ORDER if bitboard.can_play(mask, col)]
+    columns.sort(key=history_table[side].__getitem__, reverse=True)
+
+    first = []
+    for column in (principal_variation.get(key), tt_column, *killer_moves[depth]):
+        if column is not None and column in columns and column not in first:
+            first.append(column)
+    if not first:
+        return columns
+    return first + [col for col in columns if col not in first]
+
+def record_cutoff(column: int, depth: int, max_depth: int, side: int):
+    killers = killer_moves[depth]
+    if killers[0] != column:
+        killers[1] = killers[0]
+        killers[0] = column
+    history_table[side][column] += (max_depth - depth) ** 2
+
+def update_principal_variation(p1: int, p2: int, key: int, max_depth: int, player: int):
+    """Rebuild the principal variation by following best columns in the table."""
+    principal_variation.clear()
+    for _ in range(max_depth):
+        entry = transposition_table.probe(key)
+        if entry is None or entry[3] is None or key in principal_variation:
+            break
+        column = entry[3]
+        principal_variation[key] = column
+        bit = bitboard.move_bit(p1 | p2, column)
+        if player == 1:
+            p1 |= bit
+            key ^= ZOBRIST_P1[bit.bit_length() - 1] ^ ZOBRIST_SIDE
+        else:
+            p2 |= bit
+            key ^= ZOBRIST_P2[bit.bit_length() - 1] ^ ZOBRIST_SIDE
+        player = -player
+
+# Win/loss scores depend on the distance from the root (1000 - depth), so
+# the table stores them relative to the node instead
+MATE_THRESHOLD = 1000 - ROWS * COLS
+
+def score_to_table(value: float, depth: int) -> float:
+    if value >= MATE_THRESHOLD:
+        return value + depth
+    if value <= -MATE_THRESHOLD:
+        return value - depth
+    return value
+
+def score_from_table(value: float, depth: int) -> float:
+    if value >= MATE_THRESHOLD:
+        return value - depth
+    if value <= -MATE_THRESHOLD:
+        return value + depth
+    return value
+
+def window_score_tables(win_count: int) -> Tuple[List[List[float]], int, List[float]]:
+    """evaluate_window for every (player 1 count, player 2 count), and the
+    same scores by code, player 1 count * code step + player 2 count."""
+    window_scores = [[evaluate_window([1] * p1_count + [-1] * p2_count + [0] * (win_count - p1_count - p2_count))
+                      if p1_count + p2_count <= win_count else 0
+                      for p2_count in range(win_count + 1)]
+                     for p1_count in range(win_count + 1)]
+    code_step = win_count + 1
+    score_by_code = [window_scores[code // code_step][code % code_step] for code in range(code_step ** 2)]
+    return window_scores, code_step, score_by_code
+
+# evaluate_window score indexed by [player 1 count][player 2 count], and by code
+WINDOW_SCORES, CODE_STEP, SCORE_BY_CODE = window_score_tables(WIN_COUNT)
+
+def bb_evaluate_board(p1: int, p2: int) -> float:
+    """Same score as evaluate_board, computed from the window masks."""
+    score = 0
+    for window in bitboard.WINDOW_MASKS:
+        score += WINDOW_SCORES[(p1 & window).bit_count()][(p2 & window).bit_count()]
+
+    # Bonus for center column
+    score += 3 * (p1 & bitboard.COLUMN_MASKS[COLS // 2]).bit_count()
+    return score
+
+# Incremental evaluation: each window is kept as a single code,
+# player 1 count * CODE_STEP + player 2 count, so a move is one addition
+# Score change when player 1 / player 2 adds a disc to a window with this code
+P1_DELTA = [SCORE_BY_CODE[code + CODE_STEP] - SCORE_BY_CODE[code] if code + CODE_STEP < CODE_STEP ** 2 else 0
+            for code in range(CODE_STEP ** 2)]
+P2_DELTA = [SCORE_BY_CODE[code + 1] - SCORE_BY_CODE[code] if code % CODE_STEP < WIN_COUNT else 0
+            for code in range(CODE_STEP ** 2)]
+
+# Windows containing each bit index, and the center bonus player 1 gets there
+CELL_WINDOWS = [tuple(w for w, window in enumerate(bitboard.WINDOW_MASKS) if window >> index & 1)
+                for index in range(COLS * bitboard.HEIGHT)]
+CENTER_BONUS = [3 if index // bitboard.HEIGHT == COLS // 2 else 0 for index in range(COLS * bitboard.HEIGHT)]
+
+class IncrementalEvaluator:
+    """Running bb_evaluate_board score, updated one disc at a time.
+
+    `play` touches only the windows through the new disc and `undo`
+    reverses exactly that, so reading `score` at a leaf costs nothing.
+    """
+
+    def __init__(self, p1: int = 0, p2: int = 0):
+        self.reset(p1, p2)
+
+    def reset(self, p1: int, p2: int):
+        self.codes = [(p1 & window).bit_count() * CODE_STEP + (p2 & window).bit_count()
+                      for window in bitboard.WINDOW_MASKS]
+        self.score = bb_evaluate_board(p1, p2)
+
+    def copy_from(self, other: "IncrementalEvaluator"):
+        self.codes[:] = other.codes
+        self.score = other.score
+
+    def play(self, index: int, player: int):
+        codes = self.codes
+        score = self.score
+        if player == 1:
+            for w in CELL_WINDOWS[index]:
+                code = codes[w]
+                score += P1_DELTA[code]
+                codes[w] = code + CODE_STEP
+            score += CENTER_BONUS[index]
+        else:
+            for w in CELL_WINDOWS[index]:
+                code = codes[w]
+                score += P2_DELTA[code]
+                codes[w] = code + 1
+        self.score = score
+
+    def undo(self, index: int, player: int):
+        codes = self.codes
+        score = self.score
+        if player == 1:
+            for w in CELL_WINDOWS[index]:
+                code = codes[w] - CODE_STEP
+                score -= P1_DELTA[code]
+                codes[w] = code
+            score -= CENTER_BONUS[index]
+        else:
+            for w in CELL_WINDOWS[index]:
+                code = codes[w] - 1
+                score -= P2_DELTA[code]
+                codes[w] = code
+        self.score = score
+
+# Evaluator for the bitboard search, set to the root by bitboard_search (or an Engine)
+evaluator = IncrementalEvaluator()
+
+# The engine behind ai_decision, over the module-level state above
+default_engine = Engine._from_globals()
@@ -1,35 +1,70 @@
 import time
 import importlib
-from typing import List
+from typing import Callable, List, Optional, Sequence
+
+import geometry
+from ai_worker import AIWorker, decision_function
+
+# Hard limit on a sandboxed AI's move, in seconds
+MOVE_TIME = 11.0
 
 class Referee:
-    def __init__(self):
-        self.ROWS = 6
-        self.COLS = 12
+    def __init__(self, display: bool = True, sandbox: bool = True, move_time: float = MOVE_TIME,
+                 board_geometry: geometry.Geometry = geometry.get_geometry(6, 12, 4)):
+        self.geometry = board_geometry
+        self.ROWS = board_geometry.rows
+        self.COLS = board_geometry.cols
+        self.display = display
         self.board = [[0 for _ in range(self.COLS)] for _ in range(self.ROWS)]
+        self.moves: List[int] = []
+        # How the last match ended: "win", "draw", "illegal", "timeout" or "crash"
+        self.result = None
+
+        # Sandboxed: each AI runs in its own worker process, loaded once
+        self.sandbox = sandbox
+        self.move_time = move_time
+        self.workers = {}
         
         # Force reload of both AIs
         self.reload_ais()
 
     def reload_ais(self):
         """Reload AI modules to take into account any changes"""
+        if self.sandbox:
+            # Workers restart only when their source file changed
+            for name in ("ia_a", "ia_b"):
+                if name not in self.workers:
+                    self.workers[name] = AIWorker(name)
+                self.workers[name].refresh()
+            self.ia_a_func = self._sandboxed(self.workers["ia_a"])
+            self.ia_b_func = self._sandboxed(self.workers["ia_b"])
+            return
+
         # Reload AI A
         import ia_a
         importlib.reload(ia_a)
-        from ia_a import ai_decision as ia_a_decision
-        self.ia_a_func = ia_a_decision
+        self.ia_a_func = decision_function(ia_a)
         
         # Reload AI B
         import ia_b
         importlib.reload(ia_b)
-        from ia_b import ai_decision as ia_b_decision
-        self.ia_b_func = ia_b_decision
+        self.ia_b_func = decision_function(ia_b)
+
+    def _sandboxed(self, worker: AIWorker) -> Callable[[List[List[int]], int], Optional[int]]:
+        def decide(board: List[List[int]], player: int) -> Optional[int]:
+            return worker.decide(board, player, self.move_time, self.geometry.win_count)
+        return decide
+
+    def close(self):
+        """Stop the AI worker processes."""
+        for worker in self.workers.values():
+            worker.stop()
 
     def display_board(self):
         """Display the game board."""
         print("\n" + "=" * 50)
-        print("     0  1  2  3  4  5  6  7  8  9 10 11")
-        print("   " + "-" * 38)
+        print("   " + self.geometry.column_header())
+        print("   " + "-" * (3 * self.COLS + 2))
         for row in range(self.ROWS):
             print(f"{row} |", end=" ")
             for col in range(self.COLS):
@@ -40,7 +75,7 @@ class Referee:
                 else:
                     print(" B", end=" ")
             print(" |")
-        print("   " + "-" * 38)
+        print("   " + "-" * (3 * self.COLS + 2))
         print("=" * 50 + "\n")
 
     def make_move(self, col: int, player: int) -> bool:
@@ -54,82 +89,86 @@ class Referee:
         return False
 
     def check_winner(self):
-        """Check the 4 possible directions for a winner"""
-        # Horizontal
-        for row in range(self.ROWS):
-            for col in range(self.COLS - 3):
-                if (self.board[row][col] != 0 and 
-                    self.board[row][col] == self.board[row][col+1] == 
-                    self.board[row][col+2] == self.board[row][col+3]):
-                    return self.board[row][col]
-        
-        # Vertical
-        for row in range(self.ROWS - 3):
-            for col in range(self.COLS):
-                if (self.board[row][col] != 0 and 
-                    self.board[row][col] == self.board[row+1][col] == 
-                    self.board[row+2][col] == self.board[row+3][col]):
-                    return self.board[row][col]
-        
-        # Downward diagonal
-        for row in range(self.ROWS - 3):
-            for col in range(self.COLS - 3):
-                if (self.board[row][col] != 0 and 
-                    self.board[row][col] == self.board[row+1][col+1] == 
-                    self.board[row+2][col+2] == self.board[row+3][col+3]):
-                    return self.board[row][col]
-        
-        # Upward diagonal
-        for row in range(3, self.ROWS):
-            for col in range(self.COLS - 3):
-                if (self.board[row][col] != 0 and 
-                    self.board[row][col] == self.board[row-1][col+1] == 
-                    self.board[row-2][col+2] == self.board[row-3][col+3]):
-                    return self.board[row][col]
-        
-        return 0
+        """Player with a full line on the board, or 0"""
+        return self.geometry.check_winner(self.board)
 
     def is_board_full(self) -> bool:
         """Check if the board is full."""
         return all(self.board[0][col] != 0 for col in range(self.COLS))
 
-    def run_match(self):
-        """Run a match between the two AIs."""
-        print("=== STARTING MATCH: AI A vs AI B ===")
-        current_player = -1
+    def run_match(self, first_player: int = -1, opening: Sequence[int] = (),
+                  on_turn: Optional[Callable[[int], None]] = None) -> int:
+        """Run a match between the two AIs (A plays 1, B plays -1).
+
+        `opening` columns are played first, alternately from `first_player`;
+        `on_turn(player)` is called just before each AI is asked for a move.
+        Returns the winner, 0 for a draw. An invalid move loses the game.
+        """
+        if self.display:
+            print("=== STARTING MATCH: AI A vs AI B ===")
+        if self.sandbox:
+            self.reload_ais()
+        self.board = [[0 for _ in range(self.COLS)] for _ in range(self.ROWS)]
+        self.moves = []
+        current_player = first_player
+        for col in opening:
+            self.make_move(col, current_player)
+            self.moves.append(col)
+            current_player *= -1
         turn_number = 1
+        winner = 0
 
         while True:
-            self.display_board()
-            if self.check_winner() != 0 or self.is_board_full():
+            if self.display:
+                self.display_board()
+            winner = self.check_winner()
+            if winner != 0 or self.is_board_full():
+                self.result = "win" if winner != 0 else "draw"
                 break
 
             start_time = time.time()
-            print(f"Turn {turn_number}")
+            if self.display:
+                print(f"Turn {turn_number}")
             turn_number += 1
+            if on_turn is not None:
+                on_turn(current_player)
             
+            name = "A" if current_player == 1 else "B"
             if current_player == 1:
-                col = self.ia_a_func(self.board)
-                print(f"AI A plays column {col} (time: {time.time() - start_time:.2f}s)")
+                col = self.ia_a_func(self.board, current_player)
             else:
-                col = self.ia_b_func(self.board)
-                print(f"AI B plays column {col} (time: {time.time() - start_time:.2f}s)")
+                col = self.ia_b_func(self.board, current_player)
+            worker = self.workers.get("ia_a" if current_player == 1 else "ia_b")
+            if col is None and worker is not None:
+                if self.display:
+                    print(f"Error: AI {name} failed to move ({worker.failure})!")
+                winner = -current_player
+                self.result = worker.failure
+                break
+            if self.display:
+                print(f"AI {name} plays column {col} (time: {time.time() - start_time:.2f}s)")
 
             if not self.make_move(col, current_player):
-                print(f"Error: invalid move in column {col}!")
+                if self.display:
+                    print(f"Error: invalid move in column {col}!")
+                winner = -current_player
+                self.result = "illegal"
                 break
+            self.moves.append(col)
             current_player *= -1
 
         # Final result
-        winner = self.check_winner()
-        self.display_board()
-        if winner == 1:
-            print("AI A wins!")
-        elif winner == -1:
-            print("AI B wins!")
-        else:
-            print("It's a draw!")
+        if self.display:
+            self.display_board()
+            if winner == 1:
+                print("AI A wins!")
+            elif winner == -1:
+                print("AI B wins!")
+            else:
+                print("It's a draw!")
+        return winner
 
 if __name__ == "__main__":
     referee = Referee()
-    referee.run_match()
\ No newline at end of file
+    referee.run_match()
+    referee.close()
\ No newline at end of file
@@ -1,12 +1,17 @@
-import time
 import math
 import random
-from typing import List, Tuple, Optional
+import threading
+import time
+from typing import List, Optional
 
-ROWS = 6
-COLS = 12
-WIN_COUNT = 4
-MAX_TIME = 9.96  # Time limit in seconds
+import AI
+import bitboard
+# The search (and its transposition table) lives in AI.py
+from AI import (ROWS, COLS, MAX_DEPTH, Engine, TimeManager, aspiration_search,
+                bitboard_search, check_winner, expected_reply, get_valid_columns,
+                is_terminal, make_move)
+
+PONDER = True  # Search the expected reply while the human is thinking
 
 class ConnectFour:
     def __init__(self):
@@ -23,225 +28,61 @@ class ConnectFour:
         s += "└" + ("───┴" * (COLS - 1)) + "───┘\n"
         return s
 
-def is_terminal(board: List[List[int]]) -> bool:
-    if check_winner(board) != 0:
-        return True
-    return is_board_full(board)
-
-def ai_decision(board: List[List[int]]) -> int:
-    start_time = time.time()
-
-    best_col = 0
-    depth = 1
-
-    while depth <= 6:  # MAX_DEPTH
-        if time.time() - start_time > MAX_TIME * 0.4:
-            break
-
-        try:
-            col = alpha_beta_search(board, depth, start_time)
-            if col is not None:
-                best_col = col
-            depth += 1
-        except TimeoutError:
-            break
-
-    return best_col
-
-def alpha_beta_search(board: List[List[int]], max_depth: int, start_time: float) -> Optional[int]:
-    if time.time() - start_time >= MAX_TIME:
-        raise TimeoutError()
-
-    _, best_col = max_value(board, -math.inf, math.inf, 0, max_depth, start_time)
-    return best_col
-
-def max_value(board: List[List[int]], alpha: float, beta: float,
-              depth: int, max_depth: int, start_time: float) -> Tuple[float, Optional[int]]:
-    if time.time() - start_time >= MAX_TIME:
-        raise TimeoutError()
-
-    if is_terminal(board) or depth >= max_depth:
-        return utility(board, depth), None
-
-    v = -math.inf
-    best_col = None
-
-    for col in get_valid_columns(board):
-        new_board = make_move(board, col, 1)  # PLAYER_1
-        min_val, _ = min_value(new_board, alpha, beta, depth + 1, max_depth, start_time)
-
-        if min_val > v:
-            v = min_val
-            best_col = col
-
-        if v >= beta:
-            return v, best_col
-
-        alpha = max(alpha, v)
-
-    return v, best_col
-
-def min_value(board: List[List[int]], alpha: float, beta: float,
-              depth: int, max_depth: int, start_time: float) -> Tuple[float, Optional[int]]:
-    if time.time() - start_time >= MAX_TIME:
-        raise TimeoutError()
-
-    if is_terminal(board) or depth >= max_depth:
-        return utility(board, depth), None
-
-    v = math.inf
-    best_col = None
-
-    for col in get_valid_columns(board):
-        new_board = make_move(board, col, -1)  # PLAYER_2
-        max_val, _ = max_value(new_board, alpha, beta, depth + 1, max_depth, start_time)
-
-        if max_val < v:
-            v = max_val
-            best_col = col
-
-        if v <= alpha:
-            return v, best_col
-
-        beta = min(beta, v)
-
-    return v, best_col
-
-def utility(board: List[List[int]], depth: int) -> float:
-    winner = check_winner(board)
-
-    if winner == 1:  # PLAYER_1
-        return 1000 - depth  # Faster win is preferred
-    elif winner == -1:  # PLAYER_2
-        return -1000 + depth  # Delayed loss is preferred
-    elif is_board_full(board):
-        return 0  # Draw
-    else:
-        return evaluate_board(board)
-
-def evaluate_board(board: List[List[int]]) -> float:
-    score = 0
-
-    # Evaluate all 4-cell windows
-    # Horizontal
-    for row in range(ROWS):
-        for col in range(COLS - 3):
-            window = [board[row][col + i] for i in range(4)]
-            score += evaluate_window(window)
-
-    # Vertical
-    for row in range(ROWS - 3):
-        for col in range(COLS):
-            window = [board[row + i][col] for i in range(4)]
-            score += evaluate_window(window)
-
-    # Positive diagonal
-    for row in range(ROWS - 3):
-        for col in range(COLS - 3):
-            window = [board[row + i][col + i] for i in range(4)]
-            score += evaluate_window(window)
-
-    # Negative diagonal
-    for row in range(3, ROWS):
-        for col in range(COLS - 3):
-            window = [board[row - i][col + i] for i in range(4)]
-            score += evaluate_window(window)
-
-    # Bonus for center column
-    center_col = COLS // 2
-    for row in range(ROWS):
-        if board[row][center_col] == 1:  # PLAYER_1
-            score += 3
-
-    return score
-
-def evaluate_window(window: List[int]) -> float:
-    score = 0
-    player1_count = window.count(1)   # PLAYER_1
-    player2_count = window.count(-1)  # PLAYER_2
-    empty_count = window.count(0)     # EMPTY
-
-    # Ignore windows with both players
-    if player1_count > 0 and player2_count > 0:
-        return 0
-
-    # Offensive evaluation
-    if player1_count == 4:
-        score += 1000
-    elif player1_count == 3 and empty_count == 1:
-        score += 50
-    elif player1_count == 2 and empty_count == 2:
-        score += 10
-    elif player1_count == 1 and empty_count == 3:
-        score += 1
-
-    # Defensive evaluation
-    if player2_count == 4:
-        score -= 1000
-    elif player2_count == 3 and empty_count == 1:
-        score -= 80  # More important to block
-    elif player2_count == 2 and empty_count == 2:
-        score -= 15
-    elif player2_count == 1 and empty_count == 3:
-        score -= 2
-
-    return score
-
-def get_valid_columns(board: List[List[int]]) -> List[int]:
-    valid_cols = []
-    for col in range(COLS):
-        if board[0][col] == 0:  # EMPTY
-            valid_cols.append(col)
-    return valid_cols
-
-def make_move(board: List[List[int]], col: int, player: int) -> List[List[int]]:
-    new_board = [row[:] for row in board]
-
-    # Find lowest empty row
-    for row in range(ROWS - 1, -1, -1):
-        if new_board[row][col] == 0:  # EMPTY
-            new_board[row][col] = player
-            break
-
-    return new_board
-
-def check_winner(board: List[List[int]]) -> int:
-    # Check horizontal
-    for row in range(ROWS):
-        for col in range(COLS - 3):
-            if (board[row][col] != 0 and
-                board[row][col] == board[row][col+1] ==
-                board[row][col+2] == board[row][col+3]):
-                return board[row][col]
-
-    # Check vertical
-    for row in range(ROWS - 3):
-        for col in range(COLS):
-            if (board[row][col] != 0 and
-                board[row][col] == board[row+1][col] ==
-                board[row+2][col] == board[row+3][col]):
-                return board[row][col]
-
-    # Check upward diagonal
-    for row in range(ROWS - 3):
-        for col in range(COLS - 3):
-            if (board[row][col] != 0 and
-                board[row][col] == board[row+1][col+1] ==
-                board[row+2][col+2] == board[row+3][col+3]):
-                return board[row][col]
-
-    # Check downward diagonal
-    for row in range(3, ROWS):
-        for col in range(COLS - 3):
-            if (board[row][col] != 0 and
-                board[row][col] == board[row-1][col+1] ==
-                board[row-2][col+2] == board[row-3][col+3]):
-                return board[row][col]
-
-    return 0
-
-def is_board_full(board: List[List[int]]) -> bool:
-    return all(board[0][col] != 0 for col in range(COLS))
+class Ponderer:
+    """Searches, in a background thread, the position after the human reply
+    the AI expects, while input() waits for the real one."""
+
+    def __init__(self, board: List[List[int]], player: int):
+        # `board` has the human to move; `player` is the AI
+        self.player = player
+        self.reply = expected_reply(board, -player)
+        if self.reply is None:
+            self.reply = next(col for col in AI.CENTER_ORDER if col in get_valid_columns(board))
+        self.board = make_move(board, self.reply, -player)
+        # Until the human moves there is no clock (start_time = inf)
+        self.clock = TimeManager(math.inf)
+        self.best_column = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        if not is_terminal(self.board):
+            self.thread.start()
+
+    def _run(self):
+        # Uses the game engine's table and history (it is the active engine)
+        position = bitboard.from_list(self.board)
+        score = None
+        empty_cells = sum(row.count(0) for row in self.board)
+        for depth in range(1, min(MAX_DEPTH, empty_cells) + 1):
+            if not self.clock.can_start_next():
+                break
+            AI.root_best_column = None
+            try:
+                score, column = aspiration_search(bitboard_search, position, self.player,
+                                                  depth, score, math.inf)
+            except TimeoutError:
+                if AI.root_best_column is not None:
+                    self.best_column = AI.root_best_column
+                break
+            if column is not None:
+                self.best_column = column
+            self.clock.iteration_done()
+
+    def stop(self):
+        if self.thread.is_alive():
+            AI.stop_requested = True
+            self.thread.join()
+            AI.stop_requested = False
+
+    def finish(self, action: int) -> Optional[int]:
+        """Called with the human's move. On a ponder hit the search keeps
+        going on the AI's normal clock and its move is returned; on a miss
+        it is stopped (its table entries stay) and None is returned."""
+        if action != self.reply or not self.thread.is_alive() and self.best_column is None:
+            self.stop()
+            return None
+        self.clock.start_time = time.time()
+        self.thread.join(AI.MAX_TIME)
+        self.stop()
+        return self.best_column
 
 def random_valid_move(board: List[List[int]]) -> Optional[int]:
     valid = get_valid_columns(board)
@@ -249,12 +90,17 @@ def random_valid_move(board: List[List[int]]) -> Optional[int]:
 
 def play_game():
     game = ConnectFour()
+    # Told every move, so each search starts from what the previous ones found
+    engine = Engine()
+    engine.activate()
     print("Connect Four: 1 for AI (R), 2 for human (Y)")
     first = int(input("Choose who starts (1=AI, 2=human): "))
     if first == 2:
         game.player = -1
     print(game)
     turn = 0
+    ponderer = None
+    pondered_move = None
 
     while not is_terminal(game.board):
         turn += 1
@@ -270,15 +116,26 @@ def play_game():
                 print("Invalid move. Try again.")
                 continue
             print("Human plays:", action)
+            if ponderer is not None:
+                pondered_move = ponderer.finish(action)
+                ponderer = None
         else:
             print("AI is thinking...")
-            action = ai_decision(game.board)
+            if pondered_move is not None:
+                action = pondered_move
+                pondered_move = None
+            else:
+                action = engine.decide(player=game.player)
             print("AI plays:", action)
 
         game.board = make_move(game.board, action, game.player)
+        engine.play(action, game.player)
         game.player = -game.player
         print(game)
 
+        if PONDER and game.player == -1 and not is_terminal(game.board):
+            ponderer = Ponderer(game.board, -game.player)
+
     winner = check_winner(game.board)
     if winner == 1:
         print("AI wins!")
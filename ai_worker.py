@@ -0,0 +1,136 @@
+import importlib
+import importlib.util
+import inspect
+import multiprocessing
+import operator
+import os
+import struct
+from typing import Callable, List, Optional, Tuple
+
+WIN_COUNT = 4
+
+# Request: player, rows, cols and line length, then one byte per cell (row
+# by row, value + 1). Reply: the column, or NO_MOVE when ai_decision
+# returned something else.
+REQUEST_HEADER = struct.Struct("bBBB")
+REPLY = struct.Struct("b")
+NO_MOVE = -1
+
+def encode_request(board: List[List[int]], player: int, win_count: int = WIN_COUNT) -> bytes:
+    header = REQUEST_HEADER.pack(player, len(board), len(board[0]), win_count)
+    return header + bytes(cell + 1 for row in board for cell in row)
+
+def decode_request(data: bytes) -> Tuple[List[List[int]], int, int]:
+    """(board, player, line length) from a request."""
+    player, rows, cols, win_count = REQUEST_HEADER.unpack_from(data)
+    cells = data[REQUEST_HEADER.size:]
+    if len(cells) != rows * cols:
+        raise ValueError(f"request has {len(cells)} cells for a {rows}x{cols} board")
+    board = [[cells[row * cols + col] - 1 for col in range(cols)] for row in range(rows)]
+    return board, player, win_count
+
+def decision_function(module) -> Callable[[List[List[int]], int], int]:
+    """module.ai_decision as a (board, player) function. AIs written for the
+    original referee take only the board, and are called that way."""
+    decide = module.ai_decision
+    try:
+        parameters = inspect.signature(decide).parameters.values()
+    except (TypeError, ValueError):
+        return decide
+    positional = [parameter for parameter in parameters
+                  if parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD)]
+    if len(positional) >= 2 or any(parameter.kind == parameter.VAR_POSITIONAL for parameter in parameters):
+        return decide
+    return lambda board, player: decide(board)
+
+def _serve(conn, module_name: str):
+    """Worker: import the AI once, then answer move requests until the pipe closes.
+    An exception in the AI ends the process, which the referee sees as a crash."""
+    module = importlib.import_module(module_name)
+    decide = decision_function(module)
+    while True:
+        try:
+            board, player, win_count = decode_request(conn.recv_bytes())
+        except EOFError:
+            break
+        rows, cols = len(board), len(board[0])
+        # AIs that support other boards (AI.set_geometry) are switched to this one
+        if (hasattr(module, "set_geometry")
+                and (module.ROWS, module.COLS, module.WIN_COUNT) != (rows, cols, win_count)):
+            module.set_geometry(rows, cols, win_count)
+        column = decide(board, player)
+        try:
+            column = operator.index(column)
+        except TypeError:
+            column = NO_MOVE
+        if not 0 <= column < cols:
+            column = NO_MOVE
+        conn.send_bytes(REPLY.pack(column))
+
+class AIWorker:
+    """One AI module running in its own long-lived process.
+
+    The module is imported once, so it keeps its caches from move to move
+    and game to game. A move that misses its deadline or crashes the process
+    returns None (`failure` says which); the process is then restarted on the
+    next request. `refresh` restarts it when the module's source file changes.
+    """
+
+    def __init__(self, module_name: str):
+        self.module_name = module_name
+        spec = importlib.util.find_spec(module_name)
+        if spec is None or spec.origin is None:
+            raise ImportError(f"No AI module named {module_name}")
+        self.path = spec.origin
+        self.mtime = None
+        self.process = None
+        self.conn = None
+        # Why the last decide returned None: "timeout", "crash" or "illegal"
+        self.failure = None
+
+    def start(self):
+        self.stop()
+        self.mtime = os.path.getmtime(self.path)
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve, args=(child_conn, self.module_name),
+                                               daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def stop(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.conn.close()
+            self.process = None
+            self.conn = None
+
+    def refresh(self) -> bool:
+        """Start the worker, or restart it if the source file changed. True if it (re)started."""
+        if self.process is not None and self.process.is_alive() and os.path.getmtime(self.path) == self.mtime:
+            return False
+        self.start()
+        return True
+
+    def decide(self, board: List[List[int]], player: int, timeout: float,
+               win_count: int = WIN_COUNT) -> Optional[int]:
+        """The AI's column for `player` on `board` (lines of `win_count`), or
+        None if it did not answer within `timeout` seconds, crashed (the worker
+        is then stopped) or returned something that is not a column."""
+        if self.process is None:
+            self.start()
+        try:
+            self.conn.send_bytes(encode_request(board, player, win_count))
+            if not self.conn.poll(timeout):
+                self.failure = "timeout"
+                self.stop()
+                return None
+            column = REPLY.unpack(self.conn.recv_bytes())[0]
+        except (EOFError, OSError):
+            self.failure = "crash"
+            self.stop()
+            return None
+        if column == NO_MOVE:
+            self.failure = "illegal"
+            return None
+        return column
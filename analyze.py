@@ -0,0 +1,185 @@
+import argparse
+import collections
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import AI
+import bitboard
+from transposition import zobrist_key
+
+# Positions handed to the pool ahead of the one being written, per worker
+QUEUE_PER_WORKER = 4
+
+def parse_moves(moves) -> Tuple[int, int, int]:
+    """(player 1 mask, player 2 mask, player to move) after `moves`, a list
+    of columns or a string of them separated by spaces or commas."""
+    if isinstance(moves, str):
+        moves = [int(column) for column in moves.replace(",", " ").split()]
+    return bitboard.play_moves(moves)
+
+def parse_grid(grid) -> Tuple[int, int, int]:
+    """Masks and player to move for a ROWS x COLS grid, top row first: lists
+    of 1/-1/0, or strings of X (player 1), O (player 2) and '.'."""
+    if len(grid) != bitboard.ROWS or any(len(row) != bitboard.COLS for row in grid):
+        raise ValueError(f"board is not {bitboard.ROWS}x{bitboard.COLS}")
+    cells = {"X": 1, "O": -1, ".": 0, 1: 1, -1: -1, 0: 0}
+    board = [[cells[cell] for cell in row] for row in grid]
+    p1, p2 = bitboard.from_list(board)
+    # Discs stacked from the bottom: adding one to each column only sets the bit above them
+    if (p1 | p2) + bitboard.BOTTOM_MASK & (p1 | p2):
+        raise ValueError("floating disc")
+    count1, count2 = bin(p1).count("1"), bin(p2).count("1")
+    return p1, p2, 1 if count1 == count2 else -1
+
+def parse_player(value) -> int:
+    """The side to move from a request: 1 or -1."""
+    if type(value) is not int or value not in (1, -1):
+        raise ValueError(f"player must be 1 or -1, not {value!r}")
+    return value
+
+def parse_position(line: str) -> Tuple[Optional[str], int, int, int]:
+    """(id, p1, p2, player) from one input line: a JSON object with "moves" or
+    "board" (and optional "id" and "player"), or a bare move string."""
+    line = line.strip()
+    if not line.startswith("{"):
+        return (None, *parse_moves(line))
+    record = json.loads(line)
+    if "board" in record:
+        p1, p2, player = parse_grid(record["board"])
+    else:
+        p1, p2, player = parse_moves(record.get("moves", []))
+    return record.get("id"), p1, p2, parse_player(record.get("player", player))
+
+def search_to_depth(p1: int, p2: int, player: int, depth: int) -> Tuple[float, Optional[int]]:
+    score = None
+    column = None
+    empty_cells = bitboard.ROWS * bitboard.COLS - bin(p1 | p2).count("1")
+    for iteration in range(1, min(depth, empty_cells) + 1):
+        score, column = AI.aspiration_search(AI.bitboard_search, (p1, p2), player,
+                                             iteration, score, time.time())
+    return score, column
+
+def column_scores(p1: int, p2: int, player: int, depth: int) -> List[Optional[float]]:
+    """Score of every column for `player` at `depth` (None where illegal)."""
+    AI.MAX_TIME = math.inf
+    mask = p1 | p2
+    scores = [None] * bitboard.COLS
+    for column in bitboard.valid_columns(mask):
+        bit = bitboard.move_bit(mask, column)
+        child_p1, child_p2 = (p1 | bit, p2) if player == 1 else (p1, p2 | bit)
+        own, opp = (child_p2, child_p1) if player == 1 else (child_p1, child_p2)
+        AI.evaluator.reset(child_p1, child_p2)
+        scores[column] = -AI.bb_negamax(own, opp, zobrist_key(child_p1, child_p2, -player),
+                                        -math.inf, math.inf, 1, depth, time.time(), -player)[0]
+    return scores
+
+def analyse(index: int, line: str, depth: Optional[int], max_time: Optional[float],
+            all_columns: bool) -> dict:
+    """Worker: analyse one input line from a cold table, so the result does
+    not depend on which worker gets it or what it searched before."""
+    result = {"index": index}
+    try:
+        position_id, p1, p2, player = parse_position(line)
+    except (ValueError, KeyError, TypeError) as error:
+        result["error"] = str(error)
+        return result
+    if position_id is not None:
+        result["id"] = position_id
+    result["player"] = player
+    if bitboard.has_won(p1) or bitboard.has_won(p2) or bitboard.is_full(p1 | p2):
+        result["error"] = "game is over"
+        return result
+
+    AI.transposition_table.clear()
+    AI.reset_move_ordering()
+    if depth is not None:
+        AI.MAX_TIME = math.inf
+        score, column = search_to_depth(p1, p2, player, depth)
+        reached = depth
+    else:
+        AI.MAX_TIME = max_time
+        stats = AI.SearchStats()
+        column = AI.ai_decision(bitboard.to_list(p1, p2), player, stats=stats)
+        score, reached = stats.score, stats.depth
+    result.update(column=column, score=score, depth=reached)
+    if all_columns and reached:
+        result["column_scores"] = column_scores(p1, p2, player, reached)
+    return result
+
+def _init_worker():
+    # Analysis wants searched scores, not book moves
+    AI.OPENING_BOOK = None
+
+def completed_lines(path: str) -> int:
+    """Number of complete result lines in `path`; a partly written last line
+    (from an interrupted run) is cut off."""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb+") as out:
+        data = out.read()
+        end = data.rfind(b"\n") + 1
+        out.truncate(end)
+    return data.count(b"\n", 0, end)
+
+def run(lines, out, workers: int = bitboard.WORKERS, depth: Optional[int] = None,
+        max_time: Optional[float] = None, all_columns: bool = False, skip: int = 0):
+    """Analyse the positions in `lines` (an iterable of input lines) and write
+    one JSON result per position to `out`, in input order. Only a bounded
+    number of positions is in flight at once, so memory stays flat; the
+    first `skip` positions are not analysed (resume)."""
+    if all_columns and depth is None:
+        # Scoring every column needs a fixed depth; under a time budget it would ignore it
+        raise ValueError("all_columns needs a fixed depth")
+    pending = collections.deque()
+    limit = workers * QUEUE_PER_WORKER
+    index = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        for line in lines:
+            if not line.strip():
+                continue
+            index += 1
+            if index <= skip:
+                continue
+            pending.append(executor.submit(analyse, index, line, depth, max_time, all_columns))
+            while len(pending) >= limit or (pending and pending[0].done()):
+                out.write(json.dumps(pending.popleft().result()) + "\n")
+                out.flush()
+        while pending:
+            out.write(json.dumps(pending.popleft().result()) + "\n")
+            out.flush()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse positions from a JSONL or move-string stream")
+    parser.add_argument("input", nargs="?", default="-", help="Input file (default: stdin)")
+    parser.add_argument("--out", default="-", help="Output JSONL file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=bitboard.WORKERS, help="Worker processes")
+    parser.add_argument("--depth", type=int, default=8, help="Fixed search depth (default mode)")
+    parser.add_argument("--time", type=float, help="Search each position with ai_decision for this many seconds instead")
+    parser.add_argument("--all-columns", action="store_true", help="Also score every legal column")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip the positions already in --out and append to it")
+    args = parser.parse_args()
+
+    depth = None if args.time is not None else args.depth
+    if args.all_columns and depth is None:
+        parser.error("--all-columns needs a fixed --depth, not --time")
+    skip = 0
+    if args.resume:
+        if args.out == "-":
+            parser.error("--resume needs --out")
+        skip = completed_lines(args.out)
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    out = sys.stdout if args.out == "-" else open(args.out, "a" if args.resume else "w")
+    try:
+        run(source, out, args.workers, depth, args.time, args.all_columns, skip)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
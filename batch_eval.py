@@ -0,0 +1,128 @@
+import math
+import time
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for batched evaluation
+    np = None
+
+import AI
+from AI import (check_winner_at, evaluate_utility, get_next_open_row, get_valid_columns,
+                is_board_full, make_move)
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Batched evaluation needs numpy (pip install numpy)")
+
+@lru_cache(maxsize=None)
+def _tables(board_geometry) -> tuple:
+    """numpy tables for one geometry, built on first use: the board size is
+    read from AI at call time, so AI.set_geometry applies here too."""
+    rows, cols = board_geometry.rows, board_geometry.cols
+    _, code_step, score_by_code = AI.window_score_tables(board_geometry.win_count)
+    # Flat cell indices (row * cols + col) of every window: (windows, WIN_COUNT)
+    window_index = np.array(board_geometry.lines, dtype=np.intp)
+    # Window score by code (player 1 count * code_step + player 2 count):
+    # 50/10/1 for player 1, -80/-15/-2 for player 2, 0 when mixed
+    score_table = np.array(score_by_code, dtype=np.int64)
+    center_index = np.arange(rows) * cols + cols // 2
+    return window_index, code_step, score_table, center_index
+
+def evaluate_boards(boards) -> "np.ndarray":
+    """evaluate_board for a stack of boards: (N, ROWS, COLS) int8 -> N scores."""
+    _require_numpy()
+    window_index, code_step, score_table, center_index = _tables(AI.GEOMETRY)
+    flat = np.asarray(boards, dtype=np.int8).reshape(-1, AI.ROWS * AI.COLS)
+    cells = flat[:, window_index]  # (N, windows, WIN_COUNT)
+    codes = (cells == 1).sum(axis=2) * code_step + (cells == -1).sum(axis=2)
+    scores = score_table[codes].sum(axis=1)
+
+    # Bonus for center column
+    scores += 3 * (flat[:, center_index] == 1).sum(axis=1)
+    return scores
+
+def batch_search(board: List[List[int]], player: int, max_depth: int,
+                 alpha: float, beta: float, start_time: float) -> Tuple[float, Optional[int]]:
+    """List-board search whose frontier nodes evaluate all their children
+    with one evaluate_boards call."""
+    _require_numpy()
+    if time.time() - start_time >= AI.MAX_TIME:
+        raise TimeoutError()
+
+    return batch_negamax(board, alpha, beta, 0, max_depth, start_time, player)
+
+def batch_negamax(board: List[List[int]], alpha: float, beta: float,
+                  depth: int, max_depth: int, start_time: float, player: int,
+                  last_move: Optional[Tuple[int, int]] = None) -> Tuple[float, Optional[int]]:
+    # Counted with the other backends' nodes; the limits are read from AI at
+    # call time, so changing AI.MAX_TIME applies here too
+    AI.node_count += 1
+    if AI.node_count % AI.CLOCK_CHECK_NODES == 0 and time.time() - start_time >= AI.MAX_TIME:
+        raise TimeoutError()
+
+    winner = check_winner_at(board, *last_move) if last_move is not None else 0
+    if winner != 0 or depth >= max_depth or is_board_full(board):
+        return player * evaluate_utility(board, depth, winner), None
+
+    if depth == max_depth - 1:
+        return frontier_value(board, depth, player)
+
+    value = -math.inf
+    best_column = None
+
+    for index, column in enumerate(get_valid_columns(board)):
+        row = get_next_open_row(board, column)
+        new_board = make_move(board, column, player)
+        if index == 0:
+            score = -batch_negamax(new_board, -beta, -alpha, depth + 1, max_depth, start_time,
+                                   -player, (row, column))[0]
+        else:
+            score = -batch_negamax(new_board, -alpha - 1, -alpha, depth + 1, max_depth, start_time,
+                                   -player, (row, column))[0]
+            if alpha < score < beta:
+                score = -batch_negamax(new_board, -beta, -alpha, depth + 1, max_depth, start_time,
+                                       -player, (row, column))[0]
+
+        if score > value:
+            value = score
+            best_column = column
+
+        if value >= beta:
+            return value, best_column
+
+        alpha = max(alpha, value)
+
+    return value, best_column
+
+def frontier_value(board: List[List[int]], depth: int, player: int) -> Tuple[float, Optional[int]]:
+    """Best child of a node one ply above the horizon. Terminal children are
+    scored directly; the rest are evaluated together in one batch."""
+    value = -math.inf
+    best_column = None
+    pending_columns = []
+    pending_boards = []
+
+    for column in get_valid_columns(board):
+        row = get_next_open_row(board, column)
+        new_board = make_move(board, column, player)
+        winner = check_winner_at(new_board, row, column)
+        if winner != 0 or is_board_full(new_board):
+            score = player * evaluate_utility(new_board, depth + 1, winner)
+            if score > value:
+                value = score
+                best_column = column
+        else:
+            pending_columns.append(column)
+            pending_boards.append(new_board)
+
+    if pending_boards:
+        scores = evaluate_boards(pending_boards) * player
+        # First best in column order, like the sequential search
+        for column, score in zip(pending_columns, scores.tolist()):
+            if score > value or (score == value and column < best_column):
+                value = score
+                best_column = column
+
+    return value, best_column
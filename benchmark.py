@@ -0,0 +1,230 @@
+import argparse
+import importlib
+import inspect
+import json
+import math
+import os
+import sys
+import time
+from typing import List, Optional, Tuple
+
+import bitboard
+
+SUITE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_positions.json")
+# Relative slowdown (time to depth, or nodes/sec under a time limit) flagged as a regression
+REGRESSION_THRESHOLD = 0.10
+# Runs shorter than this (seconds) are too noisy to judge speed on
+MIN_TIMED = 0.05
+# Engine module attributes the fixed-depth mode drives directly
+DEPTH_MODE_API = ("transposition_table", "reset_move_ordering", "aspiration_search", "bitboard_search")
+
+def load_suite(path: str = SUITE) -> dict:
+    with open(path) as suite_file:
+        suite = json.load(suite_file)
+    if (suite["rows"], suite["cols"]) != (bitboard.ROWS, bitboard.COLS):
+        raise ValueError(f"{path} is not a {bitboard.ROWS}x{bitboard.COLS} suite")
+    return suite
+
+def position_board(moves: List[int]) -> Tuple[List[List[int]], int]:
+    """List board after playing `moves` from the empty board, and the player to move."""
+    p1, p2, player = bitboard.play_moves(moves)
+    return bitboard.to_list(p1, p2), player
+
+def bench_depth(engine, board: List[List[int]], player: int, depth: int) -> dict:
+    """Iterative deepening to a fixed `depth` from a cold table, timing each iteration."""
+    engine.MAX_TIME = math.inf
+    engine.transposition_table.clear()
+    engine.reset_move_ordering()
+    position = bitboard.from_list(board)
+    start_nodes = engine.node_count
+    start = time.perf_counter()
+    score = None
+    column = None
+    depths = []
+    empty_cells = sum(row.count(0) for row in board)
+    for iteration in range(1, min(depth, empty_cells) + 1):
+        score, column = engine.aspiration_search(engine.bitboard_search, position, player,
+                                                 iteration, score, time.time())
+        depths.append({"depth": iteration, "time": round(time.perf_counter() - start, 4),
+                       "nodes": engine.node_count - start_nodes})
+    elapsed = time.perf_counter() - start
+    nodes = engine.node_count - start_nodes
+    return {"move": column, "score": score, "depth": len(depths), "nodes": nodes, "time": round(elapsed, 4),
+            "nps": round(nodes / elapsed) if elapsed > 0 else None, "depths": depths}
+
+def check_depth_mode(engine, engine_name: str) -> None:
+    """Raise ValueError when the engine module lacks what fixed-depth mode drives."""
+    missing = [name for name in DEPTH_MODE_API if not hasattr(engine, name)]
+    if missing:
+        raise ValueError(f"{engine_name} has no {', '.join(missing)}: fixed-depth mode needs them, "
+                         f"benchmark it with --time instead")
+
+def reset_engine(engine) -> None:
+    """Forget what earlier positions left in the engine's tables, as far as the engine has them."""
+    if hasattr(engine, "transposition_table"):
+        engine.transposition_table.clear()
+    if hasattr(engine, "reset_move_ordering"):
+        engine.reset_move_ordering()
+    if hasattr(engine, "default_engine"):
+        engine.default_engine.new_game()
+
+def bench_decision(engine, board: List[List[int]], player: int, max_time: float) -> dict:
+    """One ai_decision call under `max_time` from cold tables, without the opening
+    book. Depth timings come from SearchStats when the engine has it."""
+    engine.MAX_TIME = max_time
+    if hasattr(engine, "OPENING_BOOK"):
+        engine.OPENING_BOOK = None
+    reset_engine(engine)
+    start_nodes = getattr(engine, "node_count", None)
+    stats = None
+    start = time.perf_counter()
+    if "stats" in inspect.signature(engine.ai_decision).parameters:
+        stats = engine.SearchStats()
+        column = engine.ai_decision(board, player, stats=stats)
+    else:
+        column = engine.ai_decision(board, player)
+    elapsed = time.perf_counter() - start
+    nodes = engine.node_count - start_nodes if start_nodes is not None else None
+    result = {"move": column, "nodes": nodes, "time": round(elapsed, 4),
+              "nps": round(nodes / elapsed) if nodes is not None and elapsed > 0 else None}
+    if stats is not None:
+        result["depth"] = stats.depth
+        result["stop_reason"] = stats.stop_reason
+        result["depths"] = [{"depth": record["depth"], "time": round(record["elapsed"], 4),
+                             "nodes": record["nodes"]} for record in stats.iterations]
+    return result
+
+def run_suite(engine_name: str, suite: dict, depth: Optional[int] = None,
+              max_time: Optional[float] = None, progress: bool = True,
+              settings: Optional[dict] = None) -> dict:
+    """Benchmark the engine module `engine_name` on every suite position, either
+    to a fixed `depth` or with ai_decision under `max_time`. `settings` maps
+    module constants to values used for this run only (e.g. LMR_REDUCTION=0)."""
+    engine = importlib.import_module(engine_name)
+    if depth is not None:
+        check_depth_mode(engine, engine_name)
+    settings = settings or {}
+    saved = {name: getattr(engine, name) for name in settings}
+    for name, value in settings.items():
+        setattr(engine, name, value)
+    try:
+        return _run_suite(engine, engine_name, suite, depth, max_time, progress, settings)
+    finally:
+        for name, value in saved.items():
+            setattr(engine, name, value)
+
+def _run_suite(engine, engine_name: str, suite: dict, depth: Optional[int],
+               max_time: Optional[float], progress: bool, settings: dict) -> dict:
+    if depth is not None:
+        # Warm up (imports, first allocations) outside the timed runs
+        bench_depth(engine, *position_board(suite["positions"][0]["moves"]), 2)
+    results = {"engine": engine_name, "settings": settings, "suite_version": suite["version"],
+               "mode": "depth" if depth is not None else "time",
+               "depth": depth, "max_time": max_time, "positions": []}
+    for entry in suite["positions"]:
+        board, player = position_board(entry["moves"])
+        if depth is not None:
+            result = bench_depth(engine, board, player, depth)
+        else:
+            result = bench_decision(engine, board, player, max_time)
+        result = {"name": entry["name"], "category": entry["category"], **result}
+        results["positions"].append(result)
+        if progress:
+            print(f"{engine_name:>12} {entry['name']:<14} move {result['move']!s:>2}  "
+                  f"depth {result.get('depth')!s:>2}  {result['nodes']!s:>9} nodes  "
+                  f"{result['time']:8.3f}s  {result['nps']!s:>8} n/s", file=sys.stderr)
+
+    nodes = sum(result["nodes"] or 0 for result in results["positions"])
+    elapsed = sum(result["time"] for result in results["positions"])
+    results["totals"] = {"nodes": nodes, "time": round(elapsed, 4),
+                         "nps": round(nodes / elapsed) if elapsed > 0 else None}
+    return results
+
+def compare(baseline: dict, results: dict, threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Print both runs side by side; returns the regressions found.
+    Slower is judged on time in depth mode and on nodes/sec in time mode."""
+    settings = ("suite_version", "mode", "depth", "max_time")
+    if any(baseline[key] != results[key] for key in settings):
+        raise ValueError("Runs use different suite versions or settings")
+    by_time = results["mode"] == "depth"
+    regressions = []
+    print(f"{'position':<14} {'move':>9} {'depth':>7} {'nodes':>21} {'time (s)':>19} {'n/s':>19}  flags")
+    old_positions = {result["name"]: result for result in baseline["positions"]}
+    for new in results["positions"]:
+        old = old_positions.get(new["name"])
+        if old is None:
+            continue
+        flags = []
+        if old["move"] != new["move"]:
+            flags.append("MOVE")
+        if max(old["time"], new["time"]) >= MIN_TIMED:
+            if by_time and new["time"] > old["time"] * (1 + threshold):
+                flags.append("SLOWER")
+            if not by_time and old["nps"] and new["nps"] is not None and new["nps"] < old["nps"] * (1 - threshold):
+                flags.append("SLOWER")
+        regressions.extend(f"{new['name']}: {flag}" for flag in flags)
+        print(f"{new['name']:<14} {old['move']!s:>4}>{new['move']!s:<4} "
+              f"{old.get('depth')!s:>3}>{new.get('depth')!s:<3} {old['nodes']!s:>10}>{new['nodes']!s:<10} {old['time']:9.3f}>{new['time']:<9.3f} "
+              f"{old['nps']!s:>9}>{new['nps']!s:<9}  {' '.join(flags)}")
+
+    old_totals, new_totals = baseline["totals"], results["totals"]
+    print(f"{'total':<14} {'':>9} {'':>7} {old_totals['nodes']:>10}>{new_totals['nodes']:<10} "
+          f"{old_totals['time']:9.3f}>{new_totals['time']:<9.3f} "
+          f"{old_totals['nps']!s:>9}>{new_totals['nps']!s:<9}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Engine benchmark over the position suite")
+    parser.add_argument("--engine", default="AI", help="Engine module to benchmark")
+    parser.add_argument("--baseline", help="Engine module, or results JSON file, to compare against")
+    parser.add_argument("--depth", type=int, default=7, help="Fixed search depth (default mode)")
+    parser.add_argument("--time", type=float, help="Benchmark ai_decision with this MAX_TIME instead")
+    parser.add_argument("--suite", default=SUITE, help="Position suite file")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Relative slowdown flagged as a regression")
+    parser.add_argument("--out", help="Write the engine's results to this JSON file")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="Set an engine module constant for the run (repeatable)")
+    parser.add_argument("--baseline-set", action="append", default=[], metavar="NAME=VALUE",
+                        help="Same for the baseline module, e.g. --baseline AI --baseline-set LMR_REDUCTION=0")
+    args = parser.parse_args()
+
+    def parse_settings(items: List[str]) -> dict:
+        settings = {}
+        for item in items:
+            name, _, value = item.partition("=")
+            if not value:
+                parser.error(f"expected NAME=VALUE, got {item!r}")
+            settings[name] = json.loads(value)
+        return settings
+
+    suite = load_suite(args.suite)
+    depth = None if args.time is not None else args.depth
+    if depth is not None:
+        # Check both engines before spending time on either run
+        for name in (args.engine, args.baseline):
+            if name is not None and not name.endswith(".json"):
+                try:
+                    check_depth_mode(importlib.import_module(name), name)
+                except ValueError as error:
+                    parser.error(str(error))
+    results = run_suite(args.engine, suite, depth, args.time, settings=parse_settings(args.set))
+    if args.out:
+        with open(args.out, "w") as out:
+            json.dump(results, out, indent=1)
+
+    if args.baseline is None:
+        totals = results["totals"]
+        print(f"{len(results['positions'])} positions: {totals['nodes']} nodes, "
+              f"{totals['time']:.3f}s, {totals['nps']} nodes/s")
+    else:
+        if args.baseline.endswith(".json"):
+            with open(args.baseline) as baseline_file:
+                baseline = json.load(baseline_file)
+        else:
+            baseline = run_suite(args.baseline, suite, depth, args.time,
+                                 settings=parse_settings(args.baseline_set))
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print("Regressions: " + ", ".join(regressions))
+            sys.exit(1)
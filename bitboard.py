@@ -0,0 +1,152 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import geometry
+
+ROWS = 6
+COLS = 12
+WIN_COUNT = 4
+WORKERS = os.cpu_count() or 1  # Default process count of the parallel searches and batch jobs
+
+# Each column uses ROWS + 1 bits: the extra (sentinel) bit on top of every
+# column stays empty so that shifted masks never wrap into the next column.
+HEIGHT = ROWS + 1
+
+BOTTOM_MASK = sum(1 << (col * HEIGHT) for col in range(COLS))
+BOARD_MASK = BOTTOM_MASK * ((1 << ROWS) - 1)
+
+COLUMN_MASKS = [((1 << ROWS) - 1) << (col * HEIGHT) for col in range(COLS)]
+BOTTOM_BITS = [1 << (col * HEIGHT) for col in range(COLS)]
+TOP_BITS = [1 << (ROWS - 1 + col * HEIGHT) for col in range(COLS)]
+
+# Shift for each direction: vertical, horizontal, both diagonals
+DIRECTIONS = (1, HEIGHT, HEIGHT - 1, HEIGHT + 1)
+
+def bit_index(row: int, col: int) -> int:
+    """Bit index of a cell, using the list board convention (row 0 is the top)."""
+    return col * HEIGHT + (ROWS - 1 - row)
+
+def from_list(board: List[List[int]]) -> Tuple[int, int]:
+    """Convert a list board to (player 1 mask, player 2 mask)."""
+    p1 = 0
+    p2 = 0
+    for row in range(ROWS):
+        for col in range(COLS):
+            if board[row][col] == 1:
+                p1 |= 1 << bit_index(row, col)
+            elif board[row][col] == -1:
+                p2 |= 1 << bit_index(row, col)
+    return p1, p2
+
+def to_list(p1: int, p2: int) -> List[List[int]]:
+    """Convert (player 1 mask, player 2 mask) back to a list board."""
+    board = [[0] * COLS for _ in range(ROWS)]
+    for row in range(ROWS):
+        for col in range(COLS):
+            bit = 1 << bit_index(row, col)
+            if p1 & bit:
+                board[row][col] = 1
+            elif p2 & bit:
+                board[row][col] = -1
+    return board
+
+def can_play(mask: int, col: int) -> bool:
+    return not mask & TOP_BITS[col]
+
+def valid_columns(mask: int) -> List[int]:
+    return [col for col in range(COLS) if not mask & TOP_BITS[col]]
+
+def move_bit(mask: int, col: int) -> int:
+    """Bit of the cell a disc dropped in `col` lands on."""
+    return (mask + BOTTOM_BITS[col]) & COLUMN_MASKS[col]
+
+def play_moves(moves: List[int]) -> Tuple[int, int, int]:
+    """(player 1 mask, player 2 mask, player to move) after playing the
+    columns `moves` from the empty board, player 1 first. Raises ValueError
+    on a full or unknown column, or a move after the game was won."""
+    p1, p2 = 0, 0
+    player = 1
+    for column in moves:
+        mask = p1 | p2
+        if not 0 <= column < COLS or not can_play(mask, column):
+            raise ValueError(f"illegal move {column}")
+        if has_won(p1) or has_won(p2):
+            raise ValueError("move after the end of the game")
+        bit = move_bit(mask, column)
+        if player == 1:
+            p1 |= bit
+        else:
+            p2 |= bit
+        player = -player
+    return p1, p2, player
+
+def has_won(pos: int) -> bool:
+    """True if the discs in `pos` contain WIN_COUNT in a row."""
+    for shift in DIRECTIONS:
+        m = pos & (pos >> shift)
+        if m & (m >> (2 * shift)):
+            return True
+    return False
+
+def is_full(mask: int) -> bool:
+    return mask & BOARD_MASK == BOARD_MASK
+
+def playable_cells(mask: int) -> int:
+    """Cells a disc can be dropped on right now, one per non-full column."""
+    return (mask + BOTTOM_MASK) & BOARD_MASK
+
+def lowest_column(cells: int) -> int:
+    """Column of the lowest set bit of a non-empty mask."""
+    return (cells & -cells).bit_length() // HEIGHT
+
+def winning_cells(pos: int, mask: int) -> int:
+    """Empty cells that would complete WIN_COUNT in a row for `pos`."""
+    # Vertical: only the cell on top of three discs
+    cells = (pos << 1) & (pos << 2) & (pos << 3)
+    for shift in DIRECTIONS[1:]:
+        pair = (pos << shift) & (pos << (2 * shift))
+        cells |= pair & (pos << (3 * shift))
+        cells |= pair & (pos >> shift)
+        pair = (pos >> shift) & (pos >> (2 * shift))
+        cells |= pair & (pos << shift)
+        cells |= pair & (pos >> (3 * shift))
+    return cells & (BOARD_MASK ^ mask)
+
+def _window_masks() -> List[int]:
+    windows = []
+    for line in geometry.get_geometry(ROWS, COLS, WIN_COUNT).lines:
+        window = 0
+        for cell in line:
+            window |= 1 << bit_index(cell // COLS, cell % COLS)
+        windows.append(window)
+    return windows
+
+# Every line of WIN_COUNT cells on the board, as a mask
+WINDOW_MASKS = _window_masks()
+
+class ProcessPool:
+    """ProcessPoolExecutor created on first use and kept between searches,
+    so a search does not pay for starting processes; it is restarted when
+    the worker count changes. `initializer(*initargs)` runs in every worker."""
+
+    def __init__(self, initializer: Optional[Callable] = None, initargs: tuple = ()):
+        self.initializer = initializer
+        self.initargs = initargs
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.workers = 0
+
+    def get(self, workers: int) -> ProcessPoolExecutor:
+        if self.executor is None or self.workers != workers:
+            self.shutdown()
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=self.initializer,
+                                                initargs=self.initargs)
+            self.workers = workers
+        return self.executor
+
+    def shutdown(self):
+        """Stop the worker processes (they are restarted by the next get)."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+            self.workers = 0
@@ -0,0 +1,92 @@
+from functools import lru_cache
+from typing import List, Sequence
+
+# Line directions as (row step, column step): horizontal, vertical, both diagonals
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (-1, 1))
+
+class Geometry:
+    """Board size and winning line length, with every line precomputed.
+
+    Cells are numbered row * cols + col, row 0 at the top as in the list
+    board. `lines` holds every run of `win_count` cells as a tuple of cell
+    numbers, and `cell_lines[cell]` the numbers of the lines through a cell.
+    Use get_geometry, which builds the tables once per geometry.
+    """
+
+    def __init__(self, rows: int, cols: int, win_count: int):
+        self.rows = rows
+        self.cols = cols
+        self.win_count = win_count
+
+        lines = []
+        for row in range(rows):
+            for col in range(cols):
+                for d_row, d_col in DIRECTIONS:
+                    end_row = row + d_row * (win_count - 1)
+                    end_col = col + d_col * (win_count - 1)
+                    if 0 <= end_row < rows and 0 <= end_col < cols:
+                        lines.append(tuple((row + d_row * i) * cols + col + d_col * i
+                                           for i in range(win_count)))
+        self.lines = tuple(lines)
+        self.cell_lines = tuple(tuple(index for index, line in enumerate(lines) if cell in line)
+                                for cell in range(rows * cols))
+        # Lines grouped by first cell, as ((row, col), (rest of each line as (row, col)s)):
+        # check_winner looks at a group only when its first cell is taken
+        starts = {}
+        for line in lines:
+            starts.setdefault(line[0], []).append(tuple(divmod(cell, cols) for cell in line[1:]))
+        self._line_starts = tuple((divmod(cell, cols), tuple(rests)) for cell, rests in sorted(starts.items()))
+
+    def __repr__(self) -> str:
+        return f"Geometry({self.rows}, {self.cols}, {self.win_count})"
+
+    def check_winner(self, board: List[List[int]]) -> int:
+        """1 or -1 if that player has a full line, else 0."""
+        for (row, col), rests in self._line_starts:
+            player = board[row][col]
+            if player:
+                for rest in rests:
+                    for r, c in rest:
+                        if board[r][c] != player:
+                            break
+                    else:
+                        return player
+        return 0
+
+    def winner_at(self, board: List[List[int]], row: int, col: int) -> int:
+        """Winner through the disc at (row, col): only the lines crossing that
+        cell are tested, so this is enough after a single move."""
+        player = board[row][col]
+        if player == 0:
+            return 0
+        rows, cols = self.rows, self.cols
+        for d_row, d_col in DIRECTIONS:
+            count = 1
+            r, c = row + d_row, col + d_col
+            while 0 <= r < rows and 0 <= c < cols and board[r][c] == player:
+                count += 1
+                r, c = r + d_row, c + d_col
+            r, c = row - d_row, col - d_col
+            while 0 <= r < rows and 0 <= c < cols and board[r][c] == player:
+                count += 1
+                r, c = r - d_row, c - d_col
+            if count >= self.win_count:
+                return player
+        return 0
+
+    def line_score(self, board: List[List[int]], score_by_code: Sequence[float]) -> float:
+        """Sum of score_by_code[code] over all lines, where a line's code is
+        player 1 count * (win_count + 1) + player 2 count."""
+        step = self.win_count + 1
+        weight = {1: step, -1: 1, 0: 0}
+        codes = [weight[cell] for row in board for cell in row]
+        cell_code = codes.__getitem__
+        return sum(score_by_code[sum(map(cell_code, line))] for line in self.lines)
+
+    def column_header(self, width: int = 3) -> str:
+        """Column numbers, each right-aligned in `width` characters."""
+        return "".join(str(col).rjust(width) for col in range(self.cols))
+
+@lru_cache(maxsize=None)
+def get_geometry(rows: int, cols: int, win_count: int) -> Geometry:
+    return Geometry(rows, cols, win_count)
@@ -0,0 +1,215 @@
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import AI
+import bitboard
+from transposition import DEFAULT_MAX_ENTRIES
+
+# Entry layout: two 64-bit words, (key ^ data, data). A reader recomputes
+# key from both words, so an entry torn by a concurrent writer simply fails
+# the check and reads as a miss: no locks needed.
+WORDS_PER_ENTRY = 2
+ENTRY_BYTES = 8 * WORDS_PER_ENTRY
+
+# data bits: value + VALUE_OFFSET (32) | depth (8) | bound (2) | column + 1 (4)
+VALUE_OFFSET = 1 << 31
+NO_COLUMN = 0
+
+def pack_entry(depth: int, bound: int, value: float, best_column: Optional[int]) -> int:
+    column = NO_COLUMN if best_column is None else best_column + 1
+    return (int(value) + VALUE_OFFSET) | depth << 32 | bound << 40 | column << 42
+
+def unpack_entry(data: int) -> Tuple[int, int, float, Optional[int]]:
+    column = data >> 42 & 0xF
+    return (data >> 32 & 0xFF, data >> 40 & 0x3, (data & 0xFFFFFFFF) - VALUE_OFFSET,
+            None if column == NO_COLUMN else column - 1)
+
+class SharedTranspositionTable:
+    """TranspositionTable with the same probe/store interface, stored in a
+    multiprocessing.shared_memory block that every worker maps directly.
+
+    Buckets hold a depth-preferred and an always-replace entry, as in
+    TranspositionTable. Counters are per process.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, name: Optional[str] = None):
+        self.buckets = max(1, max_entries // 2)
+        size = 2 * self.buckets * ENTRY_BYTES
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.words = self.shm.buf.cast("Q")
+        self.reset_stats()
+
+    @classmethod
+    def attach(cls, name: str, max_entries: int) -> "SharedTranspositionTable":
+        """Map an existing table created by another process (no copy)."""
+        return cls(max_entries, name)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.collisions = 0
+
+    def clear(self):
+        self.shm.buf[:] = bytes(len(self.shm.buf))
+        self.reset_stats()
+
+    def _read(self, slot: int, key: int) -> Optional[Tuple[int, int, float, Optional[int]]]:
+        words = self.words
+        data = words[WORDS_PER_ENTRY * slot + 1]
+        if data and words[WORDS_PER_ENTRY * slot] ^ data == key:
+            return unpack_entry(data)
+        return None
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, float, Optional[int]]]:
+        self.probes += 1
+        slot = 2 * (key % self.buckets)
+        entry = self._read(slot, key)
+        if entry is None:
+            entry = self._read(slot + 1, key)
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    def store(self, key: int, depth: int, bound: int, value: float, best_column: Optional[int]):
+        self.stores += 1
+        words = self.words
+        slot = 2 * (key % self.buckets)
+        data = pack_entry(depth, bound, value, best_column)
+
+        current = words[WORDS_PER_ENTRY * slot + 1]
+        current_key = words[WORDS_PER_ENTRY * slot] ^ current
+        if current == 0 or current_key == key or depth >= current >> 32 & 0xFF:
+            if current != 0 and current_key != key:
+                self._write(slot + 1, current_key, current)
+            self._write(slot, key, data)
+        else:
+            self._write(slot + 1, key, data)
+
+    def _write(self, slot: int, key: int, data: int):
+        words = self.words
+        index = WORDS_PER_ENTRY * slot
+        old = words[index + 1]
+        if old and words[index] ^ old != key:
+            self.collisions += 1
+        words[index] = key ^ data
+        words[index + 1] = data
+
+    def __len__(self) -> int:
+        return sum(1 for slot in range(2 * self.buckets) if self.words[WORDS_PER_ENTRY * slot + 1])
+
+    def stats(self) -> dict:
+        return {
+            "capacity": 2 * self.buckets,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "stores": self.stores,
+            "collisions": self.collisions,
+        }
+
+    def close(self):
+        self.words.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def _init_worker(name: str, max_entries: int):
+    AI.transposition_table = SharedTranspositionTable.attach(name, max_entries)
+
+# Shared table and pool, created on first use and kept between moves
+_table: Optional[SharedTranspositionTable] = None
+_pool = bitboard.ProcessPool(_init_worker)
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    global _table
+    if _table is None:
+        _table = SharedTranspositionTable(AI.TT_MAX_ENTRIES)
+        _pool.initargs = (_table.name, AI.TT_MAX_ENTRIES)
+    return _pool.get(workers)
+
+def shutdown():
+    """Stop the workers and free the shared table."""
+    global _table
+    _pool.shutdown()
+    if _table is not None:
+        _table.close()
+        _table = None
+
+def _worker_search(board: List[List[int]], player: int, first_depth: int, max_depth: int,
+                   start_time: float, max_time: float) -> Tuple[int, float, Optional[int]]:
+    """Worker: iterative deepening from `first_depth`, sharing the table.
+    Returns (depth, score, column) of the deepest finished iteration."""
+    AI.MAX_TIME = max_time
+    AI.reset_move_ordering()
+    position = bitboard.from_list(board)
+    result = (0, -math.inf, None)
+    score = None
+    clock = AI.TimeManager(start_time)
+    depth = first_depth
+    while depth <= max_depth and clock.can_start_next():
+        try:
+            score, column = AI.aspiration_search(AI.bitboard_search, position, player, depth,
+                                                 score, start_time)
+        except TimeoutError:
+            break
+        result = (depth, score, column)
+        clock.iteration_done()
+        depth += 1
+    return result
+
+def lazy_smp_decision(board: List[List[int]], player: int = 1, workers: int = bitboard.WORKERS,
+                      max_depth: int = AI.MAX_DEPTH) -> int:
+    """ai_decision with `workers` processes all searching the whole tree,
+    half of them one depth ahead, through one shared transposition table.
+    The answer is the move of the deepest finished iteration."""
+    start_time = time.time()
+    if AI.is_terminal(board):
+        return 0
+
+    executor = _get_executor(workers)
+    max_depth = min(max_depth, sum(row.count(0) for row in board))
+    futures = [executor.submit(_worker_search, board, player, 1 + i % 2, max_depth,
+                               start_time, AI.MAX_TIME)
+               for i in range(workers)]
+    results = [future.result() for future in futures]
+
+    # Deepest result wins; on equal depth the lower-numbered worker
+    _, _, column = max(results, key=lambda result: result[0])
+    return 0 if column is None else column
+
+if __name__ == "__main__":
+    from parallel import BENCHMARK_POSITIONS
+
+    parser = argparse.ArgumentParser(description="Lazy SMP speedup benchmark")
+    parser.add_argument("--workers", type=int, default=bitboard.WORKERS, help="Largest worker count to time")
+    parser.add_argument("--depth", type=int, default=7, help="Fixed search depth")
+    args = parser.parse_args()
+
+    AI.MAX_TIME = math.inf
+    print(f"depth {args.depth}, {len(BENCHMARK_POSITIONS)} positions, {os.cpu_count()} CPUs")
+    print("workers   time (s)   moves")
+    for workers in range(1, args.workers + 1):
+        _get_executor(workers)
+        _table.clear()
+        start = time.time()
+        moves = []
+        for sequence in BENCHMARK_POSITIONS:
+            p1, p2, player = bitboard.play_moves(sequence)
+            moves.append(lazy_smp_decision(bitboard.to_list(p1, p2), player, workers, args.depth))
+        print(f"{workers:7d}   {time.time() - start:8.2f}   {moves}")
+    shutdown()
@@ -0,0 +1,330 @@
+import argparse
+import math
+import random
+import time
+from array import array
+from typing import List, Optional, Tuple
+
+import bitboard
+
+ROWS = bitboard.ROWS
+COLS = bitboard.COLS
+MAX_TIME = 9.96  # Time limit in seconds
+SELECTION = "puct"  # Child selection: "uct" or "puct" (UCT weighted by a center-first prior)
+UCT_C = 1.4
+PUCT_C = 1.5
+WORKERS = 1  # Search processes; above 1, independent trees whose root visits are summed
+MAX_NODES = 3000000  # Nodes are no longer expanded past this (about 100 MB)
+CLOCK_CHECK_ITERATIONS = 16  # Playouts between two clock checks
+
+# Prior for PUCT selection: center columns take part in more lines
+_weights = [min(col, COLS - 1 - col) + 1 for col in range(COLS)]
+COLUMN_PRIOR = [weight / sum(_weights) for weight in _weights]
+
+# Node status, for the player who made the node's move
+UNKNOWN = 0
+WIN = 1
+DRAW = 2
+
+class Tree:
+    """Search tree in flat typed arrays, one slot per node, with the children
+    of a node in consecutive slots. Node 0 is the root: (p1, p2) with
+    `player` to move. `wins` counts playout results (1 win, 0.5 draw) for the
+    player who made the node's move."""
+
+    def __init__(self, p1: int, p2: int, player: int):
+        self.p1 = p1
+        self.p2 = p2
+        self.player = player
+        self.move = array("b")
+        self.first_child = array("i")  # -1 until expanded
+        self.child_count = array("b")
+        self.visits = array("i")
+        self.wins = array("d")
+        self.prior = array("d")
+        self.status = array("b")
+        self.add_node(-1, 1.0, UNKNOWN)
+
+    def __len__(self) -> int:
+        return len(self.move)
+
+    def add_node(self, move: int, prior: float, status: int, visits: int = 0, wins: float = 0.0):
+        self.move.append(move)
+        self.first_child.append(-1)
+        self.child_count.append(0)
+        self.visits.append(visits)
+        self.wins.append(wins)
+        self.prior.append(prior)
+        self.status.append(status)
+
+    def expand(self, node: int, own: int, opp: int):
+        """Add the children of `node` (`own` to move): only the winning move if
+        there is one, only the block if the opponent threatens, and otherwise
+        every column that does not give the opponent a win right above it."""
+        mask = own | opp
+        playable = bitboard.playable_cells(mask)
+        wins = bitboard.winning_cells(own, mask) & playable
+        threats = bitboard.winning_cells(opp, mask)
+        if wins:
+            columns = [bitboard.lowest_column(wins)]
+        elif threats & playable:
+            columns = [bitboard.lowest_column(threats & playable)]
+        else:
+            columns = [col for col in range(COLS) if bitboard.can_play(mask, col)
+                       and not bitboard.move_bit(mask, col) << 1 & threats]
+            if not columns:
+                columns = bitboard.valid_columns(mask)
+
+        total = sum(COLUMN_PRIOR[col] for col in columns)
+        self.first_child[node] = len(self.move)
+        self.child_count[node] = len(columns)
+        for col in columns:
+            bit = bitboard.move_bit(mask, col)
+            if wins:
+                status = WIN
+            elif bitboard.is_full(mask | bit):
+                status = DRAW
+            else:
+                status = UNKNOWN
+            self.add_node(col, COLUMN_PRIOR[col] / total, status)
+
+    def select(self, node: int) -> int:
+        """Child of `node` with the highest UCT or PUCT score."""
+        first = self.first_child[node]
+        visits, wins, prior = self.visits, self.wins, self.prior
+        parent_visits = visits[node]
+        best = first
+        best_score = -math.inf
+        if SELECTION == "uct":
+            log_visits = math.log(parent_visits + 1)
+            for child in range(first, first + self.child_count[node]):
+                n = visits[child]
+                if n == 0:
+                    # Unvisited children first, higher prior first
+                    score = 1e9 + prior[child]
+                else:
+                    score = wins[child] / n + UCT_C * math.sqrt(log_visits / n)
+                if score > best_score:
+                    best, best_score = child, score
+        else:
+            scale = PUCT_C * math.sqrt(parent_visits + 1)
+            for child in range(first, first + self.child_count[node]):
+                n = visits[child]
+                value = wins[child] / n if n else 0.5
+                score = value + scale * prior[child] / (1 + n)
+                if score > best_score:
+                    best, best_score = child, score
+        return best
+
+    def child(self, node: int, column: int) -> Optional[int]:
+        first = self.first_child[node]
+        if first == -1:
+            return None
+        for child in range(first, first + self.child_count[node]):
+            if self.move[child] == column:
+                return child
+        return None
+
+    def subtree(self, node: int, p1: int, p2: int, player: int) -> "Tree":
+        """Copy of the subtree under `node`, whose position is (p1, p2, player)."""
+        tree = Tree(p1, p2, player)
+        tree.visits[0] = self.visits[node]
+        tree.wins[0] = self.wins[node]
+        queue = [(node, 0)]
+        for old, new in queue:
+            first = self.first_child[old]
+            if first == -1:
+                continue
+            tree.first_child[new] = len(tree)
+            tree.child_count[new] = self.child_count[old]
+            for child in range(first, first + self.child_count[old]):
+                queue.append((child, len(tree)))
+                tree.add_node(self.move[child], self.prior[child], self.status[child],
+                              self.visits[child], self.wins[child])
+        return tree
+
+    def root_visits(self) -> List[int]:
+        """Visits of each root column (0 for columns not in the tree)."""
+        counts = [0] * COLS
+        first = self.first_child[0]
+        if first != -1:
+            for child in range(first, first + self.child_count[0]):
+                counts[self.move[child]] = self.visits[child]
+        return counts
+
+def rollout(own: int, opp: int) -> float:
+    """Random playout from (own to move, opp); 1 if `own` wins, 0.5 draw, 0 loss.
+    Moves are random except that a win is always taken and a threat blocked."""
+    side = 0  # 0 while `own` is the side to move
+    while True:
+        mask = own | opp
+        if mask == bitboard.BOARD_MASK:
+            return 0.5
+        playable = bitboard.playable_cells(mask)
+        if bitboard.winning_cells(own, mask) & playable:
+            return 1.0 - side
+        threats = bitboard.winning_cells(opp, mask) & playable
+        if threats:
+            if threats & (threats - 1):
+                return float(side)  # Two threats: the opponent wins next move
+            bit = threats
+        else:
+            col = random.randrange(COLS)
+            while mask & bitboard.TOP_BITS[col]:
+                col = random.randrange(COLS)
+            bit = bitboard.move_bit(mask, col)
+        own, opp = opp, own | bit
+        side ^= 1
+
+def search(tree: Tree, deadline: float):
+    """Run playouts on `tree` until `deadline`. Anytime: the tree is usable
+    (root expanded) as soon as this returns, whatever the deadline."""
+    root_own, root_opp = (tree.p1, tree.p2) if tree.player == 1 else (tree.p2, tree.p1)
+    if tree.first_child[0] == -1:
+        tree.expand(0, root_own, root_opp)
+    first_child, status, visits, wins, move = (tree.first_child, tree.status, tree.visits,
+                                               tree.wins, tree.move)
+    iterations = 0
+    while True:
+        iterations += 1
+        if iterations % CLOCK_CHECK_ITERATIONS == 0 and time.time() >= deadline:
+            break
+        if tree.child_count[0] == 1 and visits[0]:
+            break  # Forced move: one playout is enough to rank it
+
+        node = 0
+        own, opp = root_own, root_opp
+        path = [0]
+        while first_child[node] != -1 and status[node] == UNKNOWN:
+            node = tree.select(node)
+            own, opp = opp, own | bitboard.move_bit(own | opp, move[node])
+            path.append(node)
+        if status[node] == UNKNOWN and len(tree) < MAX_NODES:
+            tree.expand(node, own, opp)
+            node = tree.select(node)
+            own, opp = opp, own | bitboard.move_bit(own | opp, move[node])
+            path.append(node)
+
+        # Result for the player who made the last node's move
+        if status[node] == WIN:
+            value = 1.0
+        elif status[node] == DRAW:
+            value = 0.5
+        else:
+            value = 1.0 - rollout(own, opp)
+        for node in reversed(path):
+            visits[node] += 1
+            wins[node] += value
+            value = 1.0 - value
+
+# Tree of the last search, reused when the next position follows from it
+_tree: Optional[Tree] = None
+
+def reuse_tree(p1: int, p2: int, player: int) -> Tree:
+    """The last tree's subtree for this position if it is at most two moves
+    on (one of each side), else a new tree."""
+    global _tree
+    tree = _tree
+    if tree is None or tree.p1 & ~p1 or tree.p2 & ~p2:
+        return Tree(p1, p2, player)
+    if (tree.p1, tree.p2, tree.player) == (p1, p2, player):
+        return tree
+
+    node = 0
+    q1, q2, side = tree.p1, tree.p2, tree.player
+    for _ in range(2):
+        # The one new disc of the side to move, which must be playable
+        new = (p1 if side == 1 else p2) & ~(q1 if side == 1 else q2)
+        if not new or new & (new - 1):
+            break
+        column = bitboard.lowest_column(new)
+        if bitboard.move_bit(q1 | q2, column) != new:
+            break
+        node = tree.child(node, column)
+        if node is None:
+            break
+        if side == 1:
+            q1 |= new
+        else:
+            q2 |= new
+        side = -side
+        if (q1, q2, side) == (p1, p2, player):
+            return tree.subtree(node, p1, p2, player)
+    return Tree(p1, p2, player)
+
+def _worker_visits(p1: int, p2: int, player: int, deadline: float, seed: int) -> List[int]:
+    """Worker: search its own (reused) tree and return the root visits."""
+    global _tree
+    random.seed(seed)
+    _tree = reuse_tree(p1, p2, player)
+    search(_tree, deadline)
+    return _tree.root_visits()
+
+# Persistent pool, kept while the worker count stays the same
+_pool = bitboard.ProcessPool()
+
+def ai_decision(board: List[List[int]], player: int = 1, workers: Optional[int] = None) -> int:
+    """Most visited root column after searching until MAX_TIME, with `workers`
+    trees (default: the WORKERS setting at call time)."""
+    global _tree
+    start_time = time.time()
+    if workers is None:
+        workers = WORKERS
+    p1, p2 = bitboard.from_list(board)
+    mask = p1 | p2
+    if bitboard.has_won(p1) or bitboard.has_won(p2) or bitboard.is_full(mask):
+        return 0
+    deadline = start_time + MAX_TIME
+
+    if workers > 1:
+        executor = _pool.get(workers)
+        seeds = random.sample(range(1 << 30), workers)
+        futures = [executor.submit(_worker_visits, p1, p2, player, deadline, seed) for seed in seeds]
+        visits = [sum(counts) for counts in zip(*(future.result() for future in futures))]
+    else:
+        _tree = reuse_tree(p1, p2, player)
+        search(_tree, deadline)
+        visits = _tree.root_visits()
+
+    # Ties (and the never-searched case) go to the center
+    columns = [col for col in sorted(range(COLS), key=lambda col: abs(2 * col - (COLS - 1)))
+               if bitboard.can_play(mask, col)]
+    return max(columns, key=lambda col: visits[col])
+
+def play_match(games: int, max_time: float, workers: int = WORKERS) -> Tuple[int, int, int]:
+    """MCTS against AI.ai_decision with the same MAX_TIME, colors alternating.
+    Returns (MCTS wins, draws, losses)."""
+    global MAX_TIME, _tree
+    import AI
+
+    MAX_TIME = AI.MAX_TIME = max_time
+    results = [0, 0, 0]
+    for game in range(games):
+        _tree = None
+        board = [[0] * COLS for _ in range(ROWS)]
+        mcts_player = 1 if game % 2 == 0 else -1
+        player = 1
+        while not AI.is_terminal(board):
+            if player == mcts_player:
+                column = ai_decision(board, player, workers)
+            else:
+                column = AI.ai_decision(board, player)
+            board = AI.make_move(board, column, player)
+            player = -player
+        winner = AI.check_winner(board)
+        results[0 if winner == mcts_player else 1 if winner == 0 else 2] += 1
+        print(f"game {game + 1}: MCTS {'first' if mcts_player == 1 else 'second'}, "
+              f"{'MCTS wins' if winner == mcts_player else 'draw' if winner == 0 else 'alpha-beta wins'}")
+    return results[0], results[1], results[2]
+
+if __name__ == "__main__":
+    from tournament import elo_summary
+
+    parser = argparse.ArgumentParser(description="MCTS against the alpha-beta engine on equal time")
+    parser.add_argument("--games", type=int, default=10, help="Number of games")
+    parser.add_argument("--time", type=float, default=1.0, help="MAX_TIME for both engines")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="MCTS search processes")
+    args = parser.parse_args()
+
+    wins, draws, losses = play_match(args.games, args.time, args.workers)
+    print(elo_summary(wins, draws, losses))
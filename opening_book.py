@@ -0,0 +1,134 @@
+import argparse
+import math
+import mmap
+import struct
+import time
+from typing import List, Optional, Tuple
+
+import bitboard
+
+MAGIC = b"C4BOOK1\0"
+# Header: magic, rows, cols, record count
+HEADER = struct.Struct(">8sBBI")
+
+# Position key: (side to move discs + all discs) * 2 + (player 2 to move).
+# The sum is unique per position and big-endian bytes sort like the integer.
+KEY_BYTES = (bitboard.COLS * bitboard.HEIGHT + 2 + 7) // 8
+# Record: key, best column, score (for the side to move), search depth, padding
+RECORD = struct.Struct(f">{KEY_BYTES}sBhBx")
+
+def mirror_mask(mask: int) -> int:
+    """Mask with the columns in reverse order."""
+    mirrored = 0
+    column_bits = (1 << bitboard.HEIGHT) - 1
+    for col in range(bitboard.COLS):
+        mirrored |= (mask >> (col * bitboard.HEIGHT) & column_bits) << ((bitboard.COLS - 1 - col) * bitboard.HEIGHT)
+    return mirrored
+
+def position_key(p1: int, p2: int, player: int) -> int:
+    own = p1 if player == 1 else p2
+    return (own + (p1 | p2)) * 2 + (player == -1)
+
+def canonical_key(p1: int, p2: int, player: int) -> Tuple[int, bool]:
+    """Smaller of the position's key and its mirror's, and whether it is the mirror's."""
+    key = position_key(p1, p2, player)
+    mirrored = position_key(mirror_mask(p1), mirror_mask(p2), player)
+    return (mirrored, True) if mirrored < key else (key, False)
+
+class OpeningBook:
+    """Sorted fixed-size records, memory-mapped and binary-searched, so
+    opening it costs nothing and every process shares the same pages."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as book_file:
+            self.data = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, rows, cols, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or (rows, cols) != (bitboard.ROWS, bitboard.COLS):
+            self.data.close()
+            raise ValueError(f"{path} is not a {bitboard.ROWS}x{bitboard.COLS} opening book")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def lookup(self, board: List[List[int]], player: int) -> Optional[Tuple[int, int]]:
+        """(best column, score) for `player` to move on `board`, or None."""
+        p1, p2 = bitboard.from_list(board)
+        key, mirrored = canonical_key(p1, p2, player)
+        target = key.to_bytes(KEY_BYTES, "big")
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = HEADER.size + middle * RECORD.size
+            record_key = self.data[offset:offset + KEY_BYTES]
+            if record_key < target:
+                low = middle + 1
+            elif record_key > target:
+                high = middle
+            else:
+                _, column, score, _ = RECORD.unpack_from(self.data, offset)
+                return (bitboard.COLS - 1 - column if mirrored else column), score
+        return None
+
+    def close(self):
+        self.data.close()
+
+def write_book(path: str, entries: dict):
+    """Write {canonical key: (column, score, depth)} as a sorted book file."""
+    with open(path, "wb") as book_file:
+        book_file.write(HEADER.pack(MAGIC, bitboard.ROWS, bitboard.COLS, len(entries)))
+        for key in sorted(entries):
+            column, score, depth = entries[key]
+            score = max(-32768, min(32767, int(score)))
+            book_file.write(RECORD.pack(key.to_bytes(KEY_BYTES, "big"), column, score, depth))
+
+def build_book(path: str, max_ply: int, depth: int):
+    """Search every position up to `max_ply` discs (either player starting)
+    to a fixed `depth` and write the results to `path`."""
+    import AI
+
+    AI.MAX_TIME = math.inf
+    entries = {}
+    frontier = {}
+    for first_player in (1, -1):
+        p1, p2 = 0, 0
+        frontier[canonical_key(p1, p2, first_player)[0]] = (p1, p2, first_player)
+
+    for ply in range(max_ply + 1):
+        start = time.time()
+        next_frontier = {}
+        for key, (p1, p2, player) in frontier.items():
+            AI.reset_move_ordering()
+            score = None
+            for iteration in range(1, depth + 1):
+                score, column = AI.aspiration_search(AI.bitboard_search, (p1, p2), player,
+                                                     iteration, score, time.time())
+            # Store the column as seen from the canonical orientation
+            if canonical_key(p1, p2, player)[1]:
+                column = bitboard.COLS - 1 - column
+            entries[key] = (column, score, depth)
+
+            if ply == max_ply:
+                continue
+            mask = p1 | p2
+            for col in bitboard.valid_columns(mask):
+                bit = bitboard.move_bit(mask, col)
+                child = (p1 | bit, p2) if player == 1 else (p1, p2 | bit)
+                if bitboard.has_won(child[0] if player == 1 else child[1]):
+                    continue
+                child_key = canonical_key(child[0], child[1], -player)[0]
+                if child_key not in entries:
+                    next_frontier[child_key] = (child[0], child[1], -player)
+        print(f"ply {ply}: {len(frontier)} positions in {time.time() - start:.1f}s")
+        frontier = next_frontier
+
+    write_book(path, entries)
+    print(f"wrote {len(entries)} positions to {path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the opening book by offline deep search")
+    parser.add_argument("--ply", type=int, default=2, help="Deepest position in the book, in discs played")
+    parser.add_argument("--depth", type=int, default=9, help="Search depth for every position")
+    parser.add_argument("--out", default="opening_book.bin", help="Output file")
+    args = parser.parse_args()
+    build_book(args.out, args.ply, args.depth)
@@ -0,0 +1,142 @@
+import argparse
+import math
+import multiprocessing
+import os
+import time
+from typing import List, Optional, Tuple
+
+import AI
+import bitboard
+from transposition import zobrist_key
+
+# Best exact root score found so far in the current iteration, shared by all workers
+_best_score = multiprocessing.Value("d", -math.inf)
+
+def _init_worker(best_score):
+    global _best_score
+    _best_score = best_score
+    # Only trust table entries of exactly the needed depth, so a root move's
+    # score does not depend on what else the worker searched before
+    AI.TT_EXACT_DEPTH = True
+    # Reductions follow the worker's own move ordering and extensions its
+    # path, neither of which is in the table key: search every move fully
+    AI.LMR_REDUCTION = 0
+    AI.MAX_EXTENSIONS = 0
+
+# Persistent pool, kept while the worker count stays the same
+_pool = bitboard.ProcessPool(_init_worker, (_best_score,))
+
+def shutdown():
+    """Stop the worker processes (they are restarted on the next search)."""
+    _pool.shutdown()
+
+def _search_columns(p1: int, p2: int, player: int, columns: List[int], max_depth: int,
+                    start_time: float, max_time: float) -> Optional[List[Tuple[int, float, bool]]]:
+    """Worker: search each root column in turn, pruning against the best score
+    any worker has proven so far. Returns (column, score, exact) triples, or
+    None if the deadline hit first."""
+    AI.MAX_TIME = max_time
+    mask = p1 | p2
+    results = []
+    try:
+        for column in columns:
+            bit = bitboard.move_bit(mask, column)
+            child_p1, child_p2 = (p1 | bit, p2) if player == 1 else (p1, p2 | bit)
+            own, opp = (child_p2, child_p1) if player == 1 else (child_p1, child_p2)
+
+            # One below the bound, so moves that tie with it still get an exact score
+            alpha = _best_score.value - 1
+            AI.evaluator.reset(child_p1, child_p2)
+            score = -AI.bb_negamax(own, opp, zobrist_key(child_p1, child_p2, -player),
+                                   -math.inf, -alpha, 1, max_depth, start_time, -player)[0]
+            exact = score > alpha
+            results.append((column, score, exact))
+
+            if exact:
+                with _best_score.get_lock():
+                    if score > _best_score.value:
+                        _best_score.value = score
+    except TimeoutError:
+        return None
+    return results
+
+def parallel_decision(board: List[List[int]], player: int = 1, workers: int = bitboard.WORKERS,
+                      max_depth: int = AI.MAX_DEPTH) -> int:
+    """ai_decision with the root columns of each iteration split across
+    `workers` processes.
+
+    Every column that could be the best gets an exact score, and ties go to
+    the static center-out order, so for a given depth the answer is the same
+    whatever the worker count or timing. Under the MAX_TIME deadline the
+    answer is that of the last depth every worker finished.
+    """
+    start_time = time.time()
+    best_column = 0
+    if AI.is_terminal(board):
+        return best_column
+
+    p1, p2 = bitboard.from_list(board)
+    mask = p1 | p2
+    static_order = [col for col in AI.CENTER_ORDER if bitboard.can_play(mask, col)]
+    order = list(static_order)
+    executor = _pool.get(workers)
+    clock = AI.TimeManager(start_time)
+
+    for depth in range(1, min(max_depth, sum(row.count(0) for row in board)) + 1):
+        if not clock.can_start_next():
+            break
+
+        _best_score.value = -math.inf
+        # Strided split, so every worker gets some of the likely best columns
+        futures = [executor.submit(_search_columns, p1, p2, player, order[i::workers],
+                                   depth, start_time, AI.MAX_TIME)
+                   for i in range(min(workers, len(order)))]
+        results = [future.result() for future in futures]
+        if any(result is None for result in results):
+            break
+
+        exact_scores = {column: score for result in results
+                        for column, score, exact in result if exact}
+        best_column = max(static_order, key=lambda col: (exact_scores.get(col, -math.inf),
+                                                         -static_order.index(col)))
+
+        # Proven scores first for the next iteration, best first
+        order = sorted(static_order, key=lambda col: -exact_scores.get(col, -math.inf))
+        clock.iteration_done()
+
+    return best_column
+
+# Fixed positions for the speedup benchmark, as sequences of played columns
+BENCHMARK_POSITIONS = [
+    [],
+    [5, 6, 5, 6, 4],
+    [5, 6, 6, 7, 7, 8, 5, 4, 3, 7],
+    [0, 11, 5, 6, 5, 6, 5, 6, 7, 4, 4, 7, 8, 3],
+]
+
+def benchmark(max_workers: int, depth: int):
+    """Time a fixed-depth parallel search of BENCHMARK_POSITIONS for 1..max_workers workers."""
+    AI.MAX_TIME = math.inf
+    boards = []
+    for moves in BENCHMARK_POSITIONS:
+        p1, p2, player = bitboard.play_moves(moves)
+        boards.append((bitboard.to_list(p1, p2), player))
+
+    print(f"depth {depth}, {len(boards)} positions, {os.cpu_count()} CPUs")
+    print("workers   time (s)   speedup   moves")
+    base = None
+    for workers in range(1, max_workers + 1):
+        _pool.get(workers)  # Start the workers before timing
+        start = time.time()
+        moves = [parallel_decision(board, player, workers, depth) for board, player in boards]
+        elapsed = time.time() - start
+        base = base or elapsed
+        print(f"{workers:7d}   {elapsed:8.2f}   {base / elapsed:7.2f}   {moves}")
+    shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Root-parallel search speedup benchmark")
+    parser.add_argument("--workers", type=int, default=bitboard.WORKERS, help="Largest worker count to time")
+    parser.add_argument("--depth", type=int, default=7, help="Fixed search depth")
+    args = parser.parse_args()
+    benchmark(args.workers, args.depth)
@@ -0,0 +1,183 @@
+import argparse
+import collections
+import glob
+import json
+import math
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed to read the shards back
+    np = None
+
+import AI
+import bitboard
+from analyze import search_to_depth
+from tournament import random_openings
+
+SHARD_RECORDS = 1 << 20  # Records per shard file (24 MB)
+GAMES_PER_WORKER = 4  # Games handed to the pool ahead of the one being written, per worker
+
+# One record per position, little-endian, 24 bytes:
+#   p1, p2   9 bytes each: discs, bit col * ROWS + row (row 0 at the bottom)
+#   player   int8: side to move (1 or -1)
+#   ply      uint8: discs on the board
+#   score    int16: search score for the side to move
+#   result   int8: final result for the side to move (1 win, 0 draw, -1 loss)
+#   depth    uint8: search depth of the score
+CELL_BYTES = (bitboard.ROWS * bitboard.COLS + 7) // 8
+RECORD = struct.Struct(f"<{CELL_BYTES}s{CELL_BYTES}sbBhbB")
+FORMAT_VERSION = 1
+
+if np is not None:
+    RECORD_DTYPE = np.dtype([("p1", "u1", (CELL_BYTES,)), ("p2", "u1", (CELL_BYTES,)),
+                             ("player", "i1"), ("ply", "u1"), ("score", "<i2"),
+                             ("result", "i1"), ("depth", "u1")])
+    assert RECORD_DTYPE.itemsize == RECORD.size
+
+def pack_cells(mask: int) -> bytes:
+    """Bitboard mask without the sentinel bits, as CELL_BYTES bytes."""
+    packed = 0
+    column_bits = (1 << bitboard.ROWS) - 1
+    for col in range(bitboard.COLS):
+        packed |= (mask >> (col * bitboard.HEIGHT) & column_bits) << (col * bitboard.ROWS)
+    return packed.to_bytes(CELL_BYTES, "little")
+
+def unpack_cells(data: bytes) -> int:
+    """Inverse of pack_cells."""
+    packed = int.from_bytes(bytes(data), "little")
+    mask = 0
+    column_bits = (1 << bitboard.ROWS) - 1
+    for col in range(bitboard.COLS):
+        mask |= (packed >> (col * bitboard.ROWS) & column_bits) << (col * bitboard.HEIGHT)
+    return mask
+
+def play_game(seed: int, opening_plies: int, depth: int) -> bytes:
+    """Worker: one self-play game from a random opening, each side searching
+    to `depth`. Returns the records of every position after the opening."""
+    AI.MAX_TIME = math.inf
+    AI.transposition_table.clear()
+    opening = random_openings(1, opening_plies, seed)[0]
+    p1, p2, player = bitboard.play_moves(opening)
+
+    positions = []
+    winner = 0
+    while True:
+        mask = p1 | p2
+        if bitboard.is_full(mask):
+            break
+        AI.reset_move_ordering()
+        score, column = search_to_depth(p1, p2, player, depth)
+        positions.append((p1, p2, player, score))
+        bit = bitboard.move_bit(mask, column)
+        p1, p2 = (p1 | bit, p2) if player == 1 else (p1, p2 | bit)
+        if bitboard.has_won(p1 if player == 1 else p2):
+            winner = player
+            break
+        player = -player
+
+    return b"".join(RECORD.pack(pack_cells(q1), pack_cells(q2), side, bin(q1 | q2).count("1"),
+                                max(-32768, min(32767, int(score))), winner * side, depth)
+                    for q1, q2, side, score in positions)
+
+class ShardWriter:
+    """Appends records to numbered shard files in a directory, starting a new
+    shard every `shard_records` records. Whole games are written at once
+    and flushed, so readers can map a shard while it grows (ignoring a
+    partial record at the end), and a restarted run appends to the last shard."""
+
+    def __init__(self, directory: str, shard_records: int = SHARD_RECORDS):
+        self.directory = directory
+        self.shard_records = shard_records
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "format.json"), "w") as format_file:
+            json.dump({"version": FORMAT_VERSION, "record_bytes": RECORD.size,
+                       "struct": RECORD.format, "rows": bitboard.ROWS, "cols": bitboard.COLS}, format_file)
+        shards = shard_paths(directory)
+        self.index = len(shards) - 1 if shards else 0
+        self.file = None
+        self._open()
+
+    def _open(self):
+        path = os.path.join(self.directory, f"shard-{self.index:05d}.bin")
+        self.file = open(path, "ab")
+        # Drop a partial record left by an interrupted write
+        size = self.file.tell()
+        if size % RECORD.size:
+            self.file.truncate(size - size % RECORD.size)
+            self.file.seek(0, os.SEEK_END)
+        self.records = self.file.tell() // RECORD.size
+
+    def write(self, data: bytes):
+        if self.records >= self.shard_records:
+            self.file.close()
+            self.index += 1
+            self._open()
+        self.file.write(data)
+        self.file.flush()
+        self.records += len(data) // RECORD.size
+
+    def close(self):
+        self.file.close()
+
+def shard_paths(directory: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(directory, "shard-*.bin")))
+
+def open_shards(directory: str) -> List["np.ndarray"]:
+    """Read-only numpy.memmap of every shard (complete records only)."""
+    if np is None:
+        raise ImportError("Reading shards needs numpy (pip install numpy)")
+    shards = []
+    for path in shard_paths(directory):
+        count = os.path.getsize(path) // RECORD.size
+        if count:
+            shards.append(np.memmap(path, dtype=RECORD_DTYPE, mode="r", shape=(count,)))
+    return shards
+
+def generate(directory: str, games: int, workers: int = bitboard.WORKERS, depth: int = 6,
+             opening_plies: int = 4, seed: int = 0, shard_records: int = SHARD_RECORDS):
+    """Play `games` self-play games over a process pool (game i uses seed
+    `seed + i`) and append their positions to the shards in `directory`."""
+    writer = ShardWriter(directory, shard_records)
+    pending = collections.deque()
+    limit = workers * GAMES_PER_WORKER
+    written = 0
+    start = time.time()
+
+    def write_next():
+        nonlocal written
+        writer.write(pending.popleft().result())
+        written += 1
+        if written % 100 == 0 or written == games:
+            print(f"{written}/{games} games, shard {writer.index}, {time.time() - start:.0f}s")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for game in range(games):
+                pending.append(executor.submit(play_game, seed + game, opening_plies, depth))
+                while len(pending) >= limit or (pending and pending[0].done()):
+                    write_next()
+            while pending:
+                write_next()
+    finally:
+        writer.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Self-play position generator")
+    parser.add_argument("--out", default="selfplay", help="Shard directory")
+    parser.add_argument("--games", type=int, default=1000, help="Number of games")
+    parser.add_argument("--workers", type=int, default=bitboard.WORKERS, help="Worker processes")
+    parser.add_argument("--depth", type=int, default=6, help="Search depth per move")
+    parser.add_argument("--opening-plies", type=int, default=4, help="Random moves before the engine plays")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed of the first game (default: from the clock, so restarts play new games)")
+    parser.add_argument("--shard-records", type=int, default=SHARD_RECORDS, help="Records per shard file")
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else int(time.time() * 1000) % (1 << 31)
+    generate(args.out, args.games, args.workers, args.depth, args.opening_plies, seed,
+             args.shard_records)
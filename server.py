@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import collections
+import json
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+import AI
+import bitboard
+from analyze import parse_grid, parse_moves, parse_player
+from opening_book import canonical_key
+
+MAX_QUEUE = 64  # Requests waiting for a worker before new ones are refused
+PER_CONNECTION = 8  # Unanswered requests per connection before it stops being read
+CACHE_SIZE = 100000
+LATENCY_WINDOW = 10000  # Recent requests the latency percentiles are taken over
+# Part of a request's deadline kept back for queueing and the reply
+SAFETY_MARGIN = 0.05
+# Longest deadline a request may ask for: the worker searches that long
+# and keeps its pool slot until it stops
+MAX_DEADLINE = 60.0
+
+def _search(p1: int, p2: int, player: int, budget: float) -> int:
+    """Worker: ai_decision under a time budget of `budget` seconds."""
+    AI.MAX_TIME = budget
+    return AI.ai_decision(bitboard.to_list(p1, p2), player)
+
+class MoveServer:
+    """JSON-lines move service: one request object per line, answered by a
+    pool of `workers` search processes.
+
+    Request: {"id": ..., "board": grid or "moves": columns, "player": 1/-1,
+    "deadline": seconds}; reply {"id": ..., "column": c, "cached": bool,
+    "latency": seconds} or {"id": ..., "error": "..."}. {"op": "stats"}
+    returns the server statistics. Replies on one connection may come out of
+    order; match them by id.
+    """
+
+    def __init__(self, workers: int = bitboard.WORKERS, max_queue: int = MAX_QUEUE,
+                 per_connection: int = PER_CONNECTION, cache_size: int = CACHE_SIZE):
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.slots = asyncio.Semaphore(workers)
+        self.max_queue = max_queue
+        self.per_connection = per_connection
+        self.cache_size = cache_size
+        # Canonical position key -> (column in canonical orientation, search budget)
+        self.cache = collections.OrderedDict()
+        # Canonical position key -> search task, shared by identical requests in flight
+        self.in_flight = {}
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.queued = 0
+        self.running = 0
+        self.requests = 0
+        self.cache_hits = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.shared = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one connection. A connection with `per_connection` requests
+        in progress is not read any further until one finishes, which pushes
+        back on the client through the socket buffers."""
+        outstanding = asyncio.Semaphore(self.per_connection)
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(line: bytes):
+            try:
+                reply = await self.answer(line)
+                async with lock:
+                    writer.write((json.dumps(reply) + "\n").encode())
+                    await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                outstanding.release()
+
+        try:
+            while True:
+                await outstanding.acquire()
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.ensure_future(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def answer(self, line: bytes) -> dict:
+        start = time.monotonic()
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {"error": "invalid JSON"}
+        if not isinstance(request, dict):
+            return {"error": "request is not an object"}
+        if request.get("op") == "stats":
+            return self.stats()
+
+        reply = {"id": request.get("id")}
+        try:
+            if "board" in request:
+                p1, p2, player = parse_grid(request["board"])
+            else:
+                p1, p2, player = parse_moves(request.get("moves", []))
+            player = parse_player(request.get("player", player))
+            deadline = float(request.get("deadline", AI.MAX_TIME))
+            if not math.isfinite(deadline) or deadline <= 0:
+                raise ValueError(f"deadline must be a positive number of seconds, not {deadline}")
+            deadline = min(deadline, MAX_DEADLINE)
+        except (ValueError, KeyError, TypeError) as error:
+            reply["error"] = str(error)
+            return reply
+        if bitboard.has_won(p1) or bitboard.has_won(p2) or bitboard.is_full(p1 | p2):
+            reply["error"] = "game is over"
+            return reply
+        self.requests += 1
+
+        key, mirrored = canonical_key(p1, p2, player)
+        cached = self.cache.get(key)
+        if cached is not None and cached[1] >= deadline - SAFETY_MARGIN:
+            self.cache.move_to_end(key)
+            self.cache_hits += 1
+            column = cached[0]
+            reply.update(column=bitboard.COLS - 1 - column if mirrored else column, cached=True)
+        else:
+            task = self.in_flight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self.cached_search(key, p1, p2, player, mirrored,
+                                                                start + deadline, deadline - SAFETY_MARGIN))
+                self.in_flight[key] = task
+                task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+            else:
+                self.shared += 1
+            try:
+                column, error = await asyncio.wait_for(asyncio.shield(task),
+                                                       start + deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                column, error = None, "deadline expired"
+            if error is not None:
+                reply["error"] = error
+                return reply
+            reply.update(column=bitboard.COLS - 1 - column if mirrored else column, cached=False)
+
+        latency = time.monotonic() - start
+        self.latencies.append(latency)
+        reply["latency"] = round(latency, 4)
+        return reply
+
+    async def cached_search(self, key: int, p1: int, p2: int, player: int, mirrored: bool,
+                            deadline: float, budget: float) -> Tuple[Optional[int], Optional[str]]:
+        """search, with the column turned to the canonical orientation and
+        cached along with the requested `budget`."""
+        column, error = await self.search(p1, p2, player, deadline)
+        if error is not None:
+            return None, error
+        if mirrored:
+            column = bitboard.COLS - 1 - column
+        self.cache[key] = (column, budget)
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return column, None
+
+    async def search(self, p1: int, p2: int, player: int,
+                     deadline: float) -> Tuple[Optional[int], Optional[str]]:
+        """(column, None) from a pool worker, or (None, error) if the queue is
+        full or `deadline` (monotonic time) passes first."""
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            return None, "busy"
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return None, "deadline expired in queue"
+        finally:
+            self.queued -= 1
+
+        # The worker stops on its own clock; the slot is held until it does,
+        # even when this request has already given up on it
+        budget = deadline - time.monotonic() - SAFETY_MARGIN
+        if budget <= 0:
+            self.slots.release()
+            self.timeouts += 1
+            return None, "deadline expired in queue"
+        self.running += 1
+        future = asyncio.get_running_loop().run_in_executor(self.executor, _search, p1, p2, player, budget)
+
+        def release(_):
+            self.running -= 1
+            self.slots.release()
+
+        future.add_done_callback(release)
+        try:
+            column = await asyncio.wait_for(asyncio.shield(future), deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return None, "deadline expired"
+        return column, None
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))], 4)
+
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "cache_hit_rate": self.cache_hits / self.requests if self.requests else 0.0,
+            "cache_entries": len(self.cache),
+            "shared_searches": self.shared,
+            "running": self.running,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "latency_p50": percentile(0.50),
+            "latency_p90": percentile(0.90),
+            "latency_p99": percentile(0.99),
+            "latency_max": latencies[-1] if latencies else None,
+        }
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+async def serve(server: MoveServer, host: str = "127.0.0.1", port: int = 7777,
+                unix_path: Optional[str] = None):
+    if unix_path is not None:
+        listener = await asyncio.start_unix_server(server.handle, path=unix_path)
+        print(f"serving on {unix_path}")
+    else:
+        listener = await asyncio.start_server(server.handle, host, port)
+        print(f"serving on {host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON-lines move server")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP address")
+    parser.add_argument("--port", type=int, default=7777, help="TCP port")
+    parser.add_argument("--unix", help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, default=bitboard.WORKERS, help="Search processes")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE, help="Waiting requests before refusing new ones")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="Cached positions")
+    args = parser.parse_args()
+
+    async def main():
+        server = MoveServer(args.workers, args.max_queue, PER_CONNECTION, args.cache_size)
+        try:
+            await serve(server, args.host, args.port, args.unix)
+        finally:
+            server.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
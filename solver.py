@@ -0,0 +1,122 @@
+import time
+from typing import Optional, Tuple
+
+import bitboard
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+SOLVER_TT_ENTRIES = 1 << 18
+CLOCK_CHECK_NODES = 1024
+
+# Separate from the heuristic search's table: values here are exact game
+# results, keyed by the unique (side to move discs + all discs) position key
+solver_table = TranspositionTable(SOLVER_TT_ENTRIES)
+
+CENTER_ORDER = sorted(range(bitboard.COLS), key=lambda col: abs(2 * col - (bitboard.COLS - 1)))
+
+class Solver:
+    """Exact win/draw/loss search on bitboards, for positions with few empty
+    cells. Raises TimeoutError past `deadline` (an absolute time.time())."""
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.nodes = 0
+
+    def solve(self, p1: int, p2: int, player: int) -> Tuple[int, Optional[int]]:
+        """(WIN/DRAW/LOSS for `player`, a column achieving it)."""
+        own, opp = (p1, p2) if player == 1 else (p2, p1)
+        mask = own | opp
+        playable = bitboard.playable_cells(mask)
+
+        winning = bitboard.winning_cells(own, mask) & playable
+        if winning:
+            return WIN, bitboard.lowest_column(winning)
+
+        columns = self._ordered_columns(own, mask, self._candidates(own, opp, mask))
+        if not columns:
+            # Every move loses at once: play any legal column
+            return LOSS, bitboard.valid_columns(mask)[0]
+
+        # Null-window tests: first "is any move a win?", then "a draw?"
+        for target in (WIN, DRAW):
+            for column in columns:
+                bit = bitboard.move_bit(mask, column)
+                if -self._negamax(opp, own | bit, -target, -target + 1) >= target:
+                    return target, column
+        return LOSS, columns[0]
+
+    def _candidates(self, own: int, opp: int, mask: int) -> int:
+        """Moves worth trying: the forced block if the opponent threatens
+        one cell, nothing if it threatens two, and never a cell right under
+        an opponent threat."""
+        playable = bitboard.playable_cells(mask)
+        threats = bitboard.winning_cells(opp, mask)
+        forced = threats & playable
+        if forced:
+            if forced & (forced - 1):
+                return 0
+            playable = forced
+        return playable & ~(threats >> 1)
+
+    def _ordered_columns(self, own: int, mask: int, candidates: int) -> list:
+        """Candidate columns, those creating the most own threats first."""
+        scored = []
+        for column in CENTER_ORDER:
+            bit = candidates & bitboard.COLUMN_MASKS[column]
+            if bit:
+                threats = bitboard.winning_cells(own | bit, mask | bit).bit_count()
+                scored.append((-threats, len(scored), column))
+        scored.sort()
+        return [column for _, _, column in scored]
+
+    def _negamax(self, own: int, opp: int, alpha: int, beta: int) -> int:
+        self.nodes += 1
+        if self.nodes % CLOCK_CHECK_NODES == 0 and time.time() >= self.deadline:
+            raise TimeoutError()
+
+        # Parents never play into an immediate loss, so the opponent's
+        # last move did not win
+        mask = own | opp
+        if bitboard.is_full(mask):
+            return DRAW
+        if bitboard.winning_cells(own, mask) & bitboard.playable_cells(mask):
+            return WIN
+
+        candidates = self._candidates(own, opp, mask)
+        if not candidates:
+            return LOSS
+
+        key = own + mask
+        entry = solver_table.probe(key)
+        if entry is not None:
+            _, bound, value, _ = entry
+            if bound == EXACT:
+                return value
+            elif bound == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+        window_alpha = alpha
+
+        value = LOSS
+        for column in self._ordered_columns(own, mask, candidates):
+            bit = candidates & bitboard.COLUMN_MASKS[column]
+            score = -self._negamax(opp, own | bit, -beta, -alpha)
+            if score > value:
+                value = score
+            if value >= beta:
+                break
+            alpha = max(alpha, value)
+
+        bound = LOWER if value >= beta else UPPER if value <= window_alpha else EXACT
+        solver_table.store(key, 0, bound, value, None)
+        return value
+
+def solve(p1: int, p2: int, player: int, deadline: float) -> Tuple[int, Optional[int]]:
+    """Exact result for `player` to move and a column achieving it."""
+    return Solver(deadline).solve(p1, p2, player)
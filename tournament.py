@@ -0,0 +1,216 @@
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import time
+import traceback
+from multiprocessing.connection import wait
+from typing import List, Optional, Sequence, Tuple
+
+import bitboard
+from AI_VS_AI import MOVE_TIME, Referee
+
+POLL_INTERVAL = 0.05
+
+def random_openings(count: int, plies: int, seed: int = 0) -> List[Tuple[int, ...]]:
+    """`count` distinct random sequences of `plies` columns, none of which
+    ends the game."""
+    rng = random.Random(seed)
+    openings = set()
+    attempts = 0
+    while len(openings) < count and attempts < 100 * count:
+        attempts += 1
+        own, opp = 0, 0
+        moves = []
+        for _ in range(plies):
+            mask = own | opp
+            col = rng.choice(bitboard.valid_columns(mask))
+            own, opp = opp, own | bitboard.move_bit(mask, col)
+            moves.append(col)
+            if bitboard.has_won(opp):
+                break
+        else:
+            openings.add(tuple(moves))
+    return sorted(openings)
+
+def elo_summary(wins: int, draws: int, losses: int) -> dict:
+    """Totals from A's side, with the Elo difference and its 95% interval
+    (None where the score is 0 or 1)."""
+    games = wins + draws + losses
+    summary = {"games": games, "wins": wins, "draws": draws, "losses": losses}
+    if games == 0:
+        return summary
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+
+    def elo(s: float) -> Optional[float]:
+        if s <= 0 or s >= 1:
+            return None
+        return round(-400 * math.log10(1 / s - 1), 1)
+
+    summary.update(score=round(score, 4), elo=elo(score),
+                   elo_low=elo(max(score - margin, 0.0)), elo_high=elo(min(score + margin, 1.0)))
+    return summary
+
+def _worker(conn, engine_time: Optional[float]):
+    """Play the games sent over `conn` until it sends None. Reports each turn
+    start so the parent can kill the process when a move overruns."""
+    # The worker process itself is the sandbox, so the AIs run in-process
+    referee = Referee(display=False, sandbox=False)
+    if engine_time is not None:
+        import ia_a
+        import ia_b
+        for module in (ia_a, ia_b):
+            if hasattr(module, "MAX_TIME"):
+                module.MAX_TIME = engine_time
+
+    def on_turn(player: int):
+        conn.send(("turn", player, time.time()))
+
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        first_player, opening = task
+        try:
+            winner = referee.run_match(first_player, opening, on_turn)
+            conn.send(("result", winner, referee.result, referee.moves))
+        except Exception:
+            conn.send(("error", traceback.format_exc(limit=3)))
+
+class Tournament:
+    """Games between ia_a and ia_b over a pool of worker processes. A worker
+    whose move runs past `move_time` is killed, its game lost by the side to
+    move, and a new worker takes its place."""
+
+    def __init__(self, workers: int = bitboard.WORKERS, move_time: float = MOVE_TIME,
+                 engine_time: Optional[float] = None):
+        self.workers = workers
+        self.move_time = move_time
+        self.engine_time = engine_time
+        self.wins = self.draws = self.losses = 0
+
+    def _start_worker(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_worker, args=(child_conn, self.engine_time),
+                                          daemon=True)
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def run(self, games: int, openings: Sequence[Sequence[int]] = ((),), out=None,
+            progress: bool = True) -> dict:
+        """Play `games` games, each opening once with either side moving first,
+        writing one JSON line per finished game (and a final summary) to `out`."""
+        # Game i: opening i // 2, A moves first on even i
+        pending = [(i, openings[(i // 2) % len(openings)]) for i in range(games)]
+        pending.reverse()
+        pool = [self._start_worker() for _ in range(min(self.workers, games))]
+        # Per worker: [game index, opening, first player, side to move, turn start]
+        running = {}
+        finished = 0
+        start = time.time()
+
+        def assign(slot: int):
+            if pending:
+                game, opening = pending.pop()
+                first_player = 1 if game % 2 == 0 else -1
+                pool[slot][1].send((first_player, opening))
+                running[slot] = [game, opening, first_player, first_player, None]
+            else:
+                pool[slot][1].send(None)
+
+        def record(slot: int, winner: int, reason: str, moves: List[int], detail: str = None):
+            nonlocal finished
+            game, opening, first_player, _, _ = running.pop(slot)
+            if winner == 1:
+                self.wins += 1
+            elif winner == -1:
+                self.losses += 1
+            else:
+                self.draws += 1
+            finished += 1
+            line = {"game": game, "opening": list(opening), "a_first": first_player == 1,
+                    "winner": {1: "A", -1: "B", 0: "draw"}[winner], "reason": reason,
+                    "moves": moves}
+            if detail:
+                line["detail"] = detail
+            if out is not None:
+                out.write(json.dumps(line) + "\n")
+                out.flush()
+            if progress and (finished % 10 == 0 or finished == games):
+                totals = elo_summary(self.wins, self.draws, self.losses)
+                print(f"{finished}/{games}  +{self.wins} ={self.draws} -{self.losses}  "
+                      f"elo {totals.get('elo')}  ({time.time() - start:.0f}s)")
+
+        def replace(slot: int):
+            process, conn = pool[slot]
+            process.kill()
+            process.join()
+            conn.close()
+            pool[slot] = self._start_worker()
+            assign(slot)
+
+        for slot in range(len(pool)):
+            assign(slot)
+
+        while running:
+            connections = {pool[slot][1]: slot for slot in running}
+            for conn in wait(list(connections), timeout=POLL_INTERVAL):
+                slot = connections[conn]
+                try:
+                    message = conn.recv()
+                except EOFError:
+                    # Worker died: the side to move loses
+                    side = running[slot][3]
+                    record(slot, -side, "crash", [])
+                    replace(slot)
+                    continue
+                if message[0] == "turn":
+                    running[slot][3:] = message[1:]
+                elif message[0] == "result":
+                    record(slot, message[1], message[2], message[3])
+                    assign(slot)
+                else:
+                    side = running[slot][3]
+                    record(slot, -side, "error", [], message[1])
+                    assign(slot)
+
+            now = time.time()
+            for slot, (_, _, _, side, turn_start) in list(running.items()):
+                if turn_start is not None and now - turn_start > self.move_time:
+                    record(slot, -side, "timeout", [])
+                    replace(slot)
+
+        for process, conn in pool:
+            process.join()
+            conn.close()
+
+        summary = elo_summary(self.wins, self.draws, self.losses)
+        if out is not None:
+            out.write(json.dumps({"summary": summary}) + "\n")
+            out.flush()
+        return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless ia_a vs ia_b tournament")
+    parser.add_argument("--games", type=int, default=100, help="Number of games")
+    parser.add_argument("--workers", type=int, default=bitboard.WORKERS, help="Games played at once")
+    parser.add_argument("--move-time", type=float, default=MOVE_TIME,
+                        help="Hard per-move limit in seconds; the side that overruns loses")
+    parser.add_argument("--engine-time", type=float, default=None,
+                        help="Set MAX_TIME in both AI modules (when they have one)")
+    parser.add_argument("--openings", type=int, default=0,
+                        help="Number of random openings (0: empty board)")
+    parser.add_argument("--opening-plies", type=int, default=4, help="Moves in each random opening")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the random openings")
+    parser.add_argument("--out", default="tournament.jsonl", help="JSONL results file")
+    args = parser.parse_args()
+
+    openings = random_openings(args.openings, args.opening_plies, args.seed) if args.openings else [()]
+    tournament = Tournament(args.workers, args.move_time, args.engine_time)
+    with open(args.out, "w") as out:
+        summary = tournament.run(args.games, openings, out)
+    print(json.dumps(summary))
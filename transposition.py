@@ -0,0 +1,132 @@
+import random
+from typing import List, Optional, Tuple
+
+import bitboard
+
+# Bound types stored with each entry
+EXACT = 0
+LOWER = 1  # Search failed high: value is a lower bound
+UPPER = 2  # Search failed low: value is an upper bound
+
+# Rough size of one stored entry (key, tuple and the ints it holds), used to
+# turn a byte budget into an entry count
+ENTRY_BYTES = 160
+
+DEFAULT_MAX_ENTRIES = 1 << 18
+
+def _zobrist_keys(seed: int) -> Tuple[List[int], List[int], int]:
+    rng = random.Random(seed)
+    size = bitboard.COLS * bitboard.HEIGHT
+    player1 = [rng.getrandbits(64) for _ in range(size)]
+    player2 = [rng.getrandbits(64) for _ in range(size)]
+    return player1, player2, rng.getrandbits(64)
+
+# One random key per (player, bit index), plus one for player 2 to move
+ZOBRIST_P1, ZOBRIST_P2, ZOBRIST_SIDE = _zobrist_keys(0x6C6F6E67)
+
+def zobrist_key(p1: int, p2: int, player: int) -> int:
+    """Full Zobrist hash of a bitboard position with `player` to move."""
+    key = ZOBRIST_SIDE if player == -1 else 0
+    for index in range(bitboard.COLS * bitboard.HEIGHT):
+        if p1 >> index & 1:
+            key ^= ZOBRIST_P1[index]
+        elif p2 >> index & 1:
+            key ^= ZOBRIST_P2[index]
+    return key
+
+class TranspositionTable:
+    """Fixed-size hash table of search results.
+
+    Each bucket holds two entries: a depth-preferred slot that keeps the
+    deepest search seen for its bucket, and an always-replace slot that takes
+    everything else. The table never grows, so memory stays flat however long
+    the game runs.
+
+    Entries are stamped with the search generation (see new_search): a deep
+    entry left by an earlier search gives way to any entry of the current
+    one, so a table kept over a whole game does not fill up with stale
+    positions, while those positions stay readable until overwritten.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: Optional[int] = None):
+        if max_bytes is not None:
+            max_entries = min(max_entries, max_bytes // ENTRY_BYTES)
+        self.buckets = max(1, max_entries // 2)
+        self.keys = [0] * (2 * self.buckets)
+        self.entries: List[Optional[Tuple[int, int, float, Optional[int]]]] = [None] * (2 * self.buckets)
+        self.generation = 0
+        self.generations = [0] * (2 * self.buckets)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.collisions = 0
+
+    def clear(self):
+        """Drop every entry (and the counters)."""
+        self.keys = [0] * (2 * self.buckets)
+        self.entries = [None] * (2 * self.buckets)
+        self.generation = 0
+        self.generations = [0] * (2 * self.buckets)
+        self.reset_stats()
+
+    def new_search(self):
+        """Start a new generation: entries stored before this are aged."""
+        self.generation += 1
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, float, Optional[int]]]:
+        """Return (depth, bound, value, best column) for `key`, or None."""
+        self.probes += 1
+        slot = 2 * (key % self.buckets)
+        if self.keys[slot] == key and self.entries[slot] is not None:
+            self.hits += 1
+            # Still in use: keep it from being replaced as stale
+            self.generations[slot] = self.generation
+            return self.entries[slot]
+        if self.keys[slot + 1] == key and self.entries[slot + 1] is not None:
+            self.hits += 1
+            return self.entries[slot + 1]
+        return None
+
+    def store(self, key: int, depth: int, bound: int, value: float, best_column: Optional[int]):
+        self.stores += 1
+        slot = 2 * (key % self.buckets)
+        entry = (depth, bound, value, best_column)
+
+        # Depth-preferred slot: same position, empty, a shallower search,
+        # or left by an earlier search
+        current = self.entries[slot]
+        if (self.keys[slot] == key or current is None or depth >= current[0]
+                or self.generations[slot] != self.generation):
+            if current is not None and self.keys[slot] != key:
+                # Push the old deep entry down instead of losing it
+                self._replace(slot + 1, self.keys[slot], current)
+            self.keys[slot] = key
+            self.entries[slot] = entry
+            self.generations[slot] = self.generation
+            return
+
+        self._replace(slot + 1, key, entry)
+
+    def _replace(self, slot: int, key: int, entry: Tuple[int, int, float, Optional[int]]):
+        if self.entries[slot] is not None and self.keys[slot] != key:
+            self.collisions += 1
+        self.keys[slot] = key
+        self.entries[slot] = entry
+
+    def __len__(self) -> int:
+        return sum(entry is not None for entry in self.entries)
+
+    def stats(self) -> dict:
+        """Counters for sizing the table: probes, hits, stores, collisions."""
+        return {
+            "capacity": 2 * self.buckets,
+            "generation": self.generation,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "stores": self.stores,
+            "collisions": self.collisions,
+        }